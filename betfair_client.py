@@ -6,20 +6,47 @@ Adapted from 02_Upset_Prediction/02_Production/betfair_client.py
 """
 
 import requests
-import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from typing import Dict, List, Optional, Any, Tuple
 import time
+import threading
 import logging
 from pathlib import Path
 import os
 import base64
+import hashlib
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _method_prefix(method: str) -> bytes:
+    """Pre-encoded JSON-RPC envelope for a method, up to the params value."""
+    return b'{"jsonrpc":"2.0","method":' + orjson.dumps(method) + b',"params":'
+
+
+def _encode_rpc_call(method: str, params: Optional[Dict], call_id: int) -> bytes:
+    """Encode a single JSON-RPC call, serializing only the params per request."""
+    return (
+        _method_prefix(method)
+        + orjson.dumps(params or {}, option=orjson.OPT_SERIALIZE_NUMPY)
+        + b',"id":%d}' % call_id
+    )
+
+
+def _format_utc_iso(epoch_seconds: int) -> str:
+    """Format epoch seconds as 'YYYY-MM-DDTHH:MM:SSZ' without strftime."""
+    tm = time.gmtime(epoch_seconds)
+    return (f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}"
+            f"T{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}Z")
+
+
 class BetfairClient:
     """
     Client for interacting with Betfair Exchange API.
@@ -37,6 +64,40 @@ class BetfairClient:
     BETTING_URL = "https://api.betfair.com/exchange/betting/json-rpc/v1"
     ACCOUNT_URL = "https://api.betfair.com/exchange/account/json-rpc/v1"
     
+    # Rate limiting: token bucket (20 requests per second, bursts up to 20)
+    RATE_LIMIT_CAPACITY = 20
+    RATE_LIMIT_PER_SECOND = 20.0
+    
+    # AIMD backpressure: additive increase on success, multiplicative
+    # decrease when Betfair signals we are sending too much
+    RATE_LIMIT_MIN_PER_SECOND = 1.0
+    RATE_INCREASE_STEP = 0.5
+    RATE_DECREASE_FACTOR = 0.5
+    RATE_LIMIT_ERROR_CODES = ('TOO_MANY_REQUESTS', 'TOO_MUCH_DATA')
+    
+    # Session tokens expire after ~4h of inactivity; refresh before that
+    SESSION_TOKEN_TTL_SECONDS = 3.5 * 3600
+    SESSION_REFRESH_MARGIN_SECONDS = 60
+    
+    # Event type IDs are effectively static; refresh the cache daily
+    EVENT_TYPE_CACHE_TTL_SECONDS = 24 * 3600
+    
+    # Max markets per listMarketBook call with EX_BEST_OFFERS (data weight limit)
+    MARKET_BOOK_CHUNK_SIZE = 40
+    
+    # Price data requested for every listMarketBook call
+    MARKET_BOOK_PRICE_PROJECTION = {
+        'priceData': ['EX_BEST_OFFERS', 'SP_AVAILABLE', 'SP_TRADED'],
+        'virtualise': True
+    }
+    
+    # Token cost per API method (heavier calls consume more of the budget)
+    METHOD_COSTS = {
+        'SportsAPING/v1.0/listEventTypes': 1,
+        'SportsAPING/v1.0/listMarketCatalogue': 3,
+        'SportsAPING/v1.0/listMarketBook': 5,
+    }
+    
     def __init__(self, username: str = None, password: str = None, 
                  app_key: str = None, cert_path: str = None, key_path: str = None):
         """
@@ -77,11 +138,48 @@ class BetfairClient:
             )
         
         self.session_token = None
+        self._token_expiry = 0.0  # time.monotonic() deadline for session_token
+        self._refresh_lock = threading.Lock()
         self.request_count = 0
-        self.last_request_time = 0
         
-        # Rate limiting: Max 20 requests per second
-        self.min_request_interval = 0.05  # 50ms between requests
+        # Persistent HTTP session: keep-alive connections avoid a fresh
+        # TCP + (mutual) TLS handshake on every Betfair call
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=3,
+                connect=3,
+                read=0,  # A read failure may mean the call (e.g. placeOrders) already ran
+                backoff_factor=0.3,
+                # Gateway errors where the request never reached Betfair's origin;
+                # 504/524 timeouts are excluded for the same reason as read=0
+                status_forcelist=(502, 503, 522),
+                allowed_methods=frozenset(['POST']),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        ))
+        self._session.cert = (self.cert_path, self.key_path)
+        self._session.headers.update({
+            'X-Application': self.app_key,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            # Market catalogue/book payloads compress well; urllib3 inflates
+            # the body transparently before response.content is read
+            'Accept-Encoding': 'gzip'
+        })
+        
+        # Rate limiting: token bucket starts full so initial bursts don't wait
+        self._capacity = self.RATE_LIMIT_CAPACITY
+        self._rate = self.RATE_LIMIT_PER_SECOND
+        self._tokens: float = float(self._capacity)
+        self._last_refill = time.monotonic()
+        self._rate_lock = threading.Lock()  # Races/timers share one client
+        
+        # Event type name -> (event type ID, monotonic fetch time)
+        self._event_type_cache: Dict[str, Tuple[str, float]] = {}
         
         logger.info("Betfair client initialized for GB Track Specialist")
     
@@ -111,68 +209,73 @@ class BetfairClient:
             temp_dir = Path(tempfile.gettempdir()) / 'betfair_certs'
             temp_dir.mkdir(exist_ok=True)
             
-            # Decode and write certificates
-            cert_file = temp_dir / 'client-2048.crt'
-            key_file = temp_dir / 'client-2048.key'
+            # Name files by a digest of the encoded input so restarts with the
+            # same certificates reuse the files instead of decoding again
+            digest = hashlib.blake2b(
+                (cert_base64 + key_base64).encode(), digest_size=16
+            ).hexdigest()
+            cert_file = temp_dir / f'client-2048.{digest}.crt'
+            key_file = temp_dir / f'client-2048.{digest}.key'
+            
+            if cert_file.exists() and key_file.exists():
+                logger.info("✓ Reusing previously decoded certificates")
+                return str(cert_file), str(key_file)
             
             try:
-                cert_file.write_bytes(base64.b64decode(cert_base64))
-                key_file.write_bytes(base64.b64decode(key_base64))
-                
-                # Set appropriate permissions (read-only for owner)
-                cert_file.chmod(0o600)
-                key_file.chmod(0o600)
+                for target, encoded in ((cert_file, cert_base64), (key_file, key_base64)):
+                    # Write then rename so a crash never leaves a partial file behind
+                    tmp_file = target.with_suffix(target.suffix + '.tmp')
+                    tmp_file.write_bytes(base64.b64decode(encoded))
+                    
+                    # Set appropriate permissions (read-only for owner)
+                    tmp_file.chmod(0o600)
+                    os.replace(tmp_file, target)
                 
-                logger.info(f"✓ Certificates decoded successfully")
+                logger.info("✓ Certificates decoded successfully")
                 return str(cert_file), str(key_file)
                 
             except Exception as e:
                 raise ValueError(f"Failed to decode base64 certificates: {str(e)}")
         
         # Otherwise, use file paths
-        if cert_path:
-            final_cert_path = cert_path
-        elif os.getenv('BETFAIR_CERT_PATH'):
-            final_cert_path = os.getenv('BETFAIR_CERT_PATH')
-        else:
-            # Look for certs in current directory or certs subdirectory
-            current_dir = Path(__file__).parent
-            possible_paths = [
-                current_dir / 'certs' / 'client-2048.crt',
-                current_dir / 'client-2048.crt',
-                Path.cwd() / 'certs' / 'client-2048.crt'
-            ]
-            final_cert_path = None
-            for path in possible_paths:
-                if path.exists():
-                    final_cert_path = str(path)
-                    break
-            if not final_cert_path:
-                # If no file found, use env var path (will error later if not found)
-                final_cert_path = str(possible_paths[0])
-        
-        if key_path:
-            final_key_path = key_path
-        elif os.getenv('BETFAIR_KEY_PATH'):
-            final_key_path = os.getenv('BETFAIR_KEY_PATH')
-        else:
-            current_dir = Path(__file__).parent
-            possible_paths = [
-                current_dir / 'certs' / 'client-2048.key',
-                current_dir / 'client-2048.key',
-                Path.cwd() / 'certs' / 'client-2048.key'
-            ]
-            final_key_path = None
-            for path in possible_paths:
-                if path.exists():
-                    final_key_path = str(path)
-                    break
-            if not final_key_path:
-                final_key_path = str(possible_paths[0])
-        
-        logger.info(f"Using certificate files from disk")
+        final_cert_path = self._resolve_path('crt', cert_path, 'BETFAIR_CERT_PATH')
+        final_key_path = self._resolve_path('key', key_path, 'BETFAIR_KEY_PATH')
+        
+        logger.info("Using certificate files from disk")
         return final_cert_path, final_key_path
     
+    def _resolve_path(self, kind: str, override: Optional[str], env_var: str) -> str:
+        """
+        Resolve a certificate or key file path.
+        
+        Args:
+            kind: File extension ('crt' or 'key')
+            override: Explicit path passed to the constructor
+            env_var: Environment variable holding the path
+            
+        Returns:
+            Path to the file (may not exist; validated by the caller)
+        """
+        if override:
+            return override
+        if os.getenv(env_var):
+            return os.getenv(env_var)
+        
+        # Look for file in current directory or certs subdirectory
+        filename = f'client-2048.{kind}'
+        current_dir = Path(__file__).parent
+        possible_paths = [
+            current_dir / 'certs' / filename,
+            current_dir / filename,
+            Path.cwd() / 'certs' / filename
+        ]
+        for path in possible_paths:
+            if path.exists():
+                return str(path)
+        
+        # If no file found, use default path (will error later if not found)
+        return str(possible_paths[0])
+    
     def login(self) -> bool:
         """
         Authenticate with Betfair and obtain session token.
@@ -184,8 +287,8 @@ class BetfairClient:
             logger.info("Logging in to Betfair...")
             
             headers = {
-                'X-Application': self.app_key,
-                'Content-Type': 'application/x-www-form-urlencoded'
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-Authentication': None  # Never send a stale token to login
             }
             
             payload = {
@@ -193,43 +296,105 @@ class BetfairClient:
                 'password': self.password
             }
             
-            response = requests.post(
+            response = self._session.post(
                 self.LOGIN_URL,
                 data=payload,
                 headers=headers,
-                cert=(self.cert_path, self.key_path),
                 timeout=30
             )
             
             if response.status_code == 200:
-                resp_json = response.json()
+                resp_json = orjson.loads(response.content)
                 
                 if resp_json.get('loginStatus') == 'SUCCESS':
                     self.session_token = resp_json.get('sessionToken')
+                    self._session.headers['X-Authentication'] = self.session_token
+                    self._token_expiry = time.monotonic() + self.SESSION_TOKEN_TTL_SECONDS
                     logger.info("✓ Login successful")
                     return True
                 else:
                     error = resp_json.get('loginStatus', 'Unknown error')
-                    logger.error(f"Login failed: {error}")
+                    logger.error("Login failed: %s", error)
                     return False
             else:
-                logger.error(f"Login request failed: {response.status_code}")
+                logger.error("Login request failed: %s", response.status_code)
                 return False
                 
         except Exception as e:
-            logger.error(f"Login error: {str(e)}")
+            logger.error("Login error: %s", e)
             return False
     
-    def _enforce_rate_limit(self):
-        """Enforce rate limiting between requests."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+    def _enforce_rate_limit(self, cost: int = 1):
+        """
+        Enforce rate limiting using a token bucket.
+        
+        The tokens are reserved under the lock (the bucket may go into debt),
+        then the caller sleeps off its share of the debt unlocked, so waiting
+        threads don't block each other or the rate adjustments.
+        
+        Args:
+            cost: Number of tokens consumed by this request
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            
+            self._tokens -= cost
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            self.request_count += 1
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _refresh_session_if_expiring(self):
+        """Re-login proactively when the session token is close to expiry."""
+        if not self.session_token or time.monotonic() <= self._token_expiry - self.SESSION_REFRESH_MARGIN_SECONDS:
+            return
+        
+        # Only one thread refreshes; others keep using the still-valid token
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        
+        try:
+            logger.info("Session token nearing expiry, refreshing...")
+            if not self.login():
+                logger.warning("Proactive session refresh failed, using existing token")
+        finally:
+            self._refresh_lock.release()
+    
+    def _increase_rate(self):
+        """Additively restore the request rate after a successful call."""
+        with self._rate_lock:
+            self._rate = min(self.RATE_LIMIT_PER_SECOND, self._rate + self.RATE_INCREASE_STEP)
+    
+    def _decrease_rate(self):
+        """Multiplicatively back off the request rate when rate limited."""
+        with self._rate_lock:
+            self._rate = max(self.RATE_LIMIT_MIN_PER_SECOND, self._rate * self.RATE_DECREASE_FACTOR)
+        logger.warning("Rate limited by Betfair, reducing to %.1f req/s", self._rate)
+    
+    def _track_rate_limit_headers(self, response):
+        """Drain the token bucket if the server reports <10% quota remaining."""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        limit = response.headers.get('X-RateLimit-Limit')
         
-        if time_since_last < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last)
+        try:
+            if remaining is not None and limit is not None and float(remaining) < 0.1 * float(limit):
+                with self._rate_lock:
+                    self._tokens = 0.0
+        except ValueError:
+            pass
+    
+    def _wait_retry_after(self, response):
+        """Honour a Retry-After header (in seconds) if present."""
+        retry_after = response.headers.get('Retry-After')
         
-        self.last_request_time = time.time()
-        self.request_count += 1
+        try:
+            if retry_after:
+                time.sleep(float(retry_after))
+        except ValueError:
+            pass
     
     def _make_api_request(self, endpoint: str, method: str, 
                           params: Dict = None, retry_on_session_error: bool = True) -> Optional[Dict]:
@@ -245,65 +410,207 @@ class BetfairClient:
         Returns:
             API response or None if error
         """
-        if not self.session_token:
-            logger.error("Not logged in. Call login() first.")
-            return None
-        
-        self._enforce_rate_limit()
+        # Retry at most once, after re-login on an expired session
+        attempts = 2 if retry_on_session_error else 1
         
-        headers = {
-            'X-Application': self.app_key,
-            'X-Authentication': self.session_token,
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        payload = {
-            'jsonrpc': '2.0',
-            'method': method,
-            'params': params or {},
-            'id': self.request_count
-        }
-        
-        try:
-            response = requests.post(
-                endpoint,
-                data=json.dumps(payload),
-                headers=headers,
-                timeout=30
-            )
+        for attempt in range(attempts):
+            if not self.session_token:
+                logger.error("Not logged in. Call login() first.")
+                return None
             
-            if response.status_code == 200:
-                resp_json = response.json()
+            self._refresh_session_if_expiring()
+            self._enforce_rate_limit(self.METHOD_COSTS.get(method, 1))
+            
+            try:
+                request_start = time.monotonic()
+                response = self._session.post(
+                    endpoint,
+                    data=_encode_rpc_call(method, params, self.request_count),
+                    timeout=30
+                )
+                logger.debug("%s completed in %.0fms", method, (time.monotonic() - request_start) * 1000)
+                
+                self._track_rate_limit_headers(response)
                 
-                if 'result' in resp_json:
-                    return resp_json['result']
-                elif 'error' in resp_json:
-                    error = resp_json['error']
+                if response.status_code == 200:
+                    resp_json = orjson.loads(response.content)
                     
-                    # Check for session expiration error
-                    error_code = error.get('data', {}).get('APINGException', {}).get('errorCode', '')
-                    if error_code == 'INVALID_SESSION_INFORMATION' and retry_on_session_error:
-                        logger.warning("Session expired, attempting to re-login...")
-                        if self.login():
-                            logger.info("✓ Re-login successful, retrying request...")
-                            return self._make_api_request(endpoint, method, params, retry_on_session_error=False)
-                        else:
+                    if 'result' in resp_json:
+                        self._increase_rate()
+                        return resp_json['result']
+                    elif 'error' in resp_json:
+                        error = resp_json['error']
+                        
+                        # Check for rate limiting / session expiration errors
+                        error_code = error.get('data', {}).get('APINGException', {}).get('errorCode', '')
+                        if error_code in self.RATE_LIMIT_ERROR_CODES:
+                            self._decrease_rate()
+                            self._wait_retry_after(response)
+                            return None
+                        
+                        if error_code == 'INVALID_SESSION_INFORMATION' and attempt + 1 < attempts:
+                            logger.warning("Session expired, attempting to re-login...")
+                            if self.login():
+                                logger.info("✓ Re-login successful, retrying request...")
+                                continue
                             logger.error("Re-login failed")
                             return None
-                    
-                    logger.error(f"API error: {error}")
+                        
+                        logger.error("API error: %s", error)
+                        return None
+                    else:
+                        logger.error("Unexpected response: %s", resp_json)
+                        return None
+                elif response.status_code == 429:
+                    self._decrease_rate()
+                    self._wait_retry_after(response)
                     return None
                 else:
-                    logger.error(f"Unexpected response: {resp_json}")
+                    logger.error("API request failed: %s", response.status_code)
                     return None
-            else:
-                logger.error(f"API request failed: {response.status_code}")
+                    
+            except Exception as e:
+                logger.error("API request error: %s", e)
                 return None
+            
+        return None
+    
+    def _make_api_batch(self, endpoint: str, calls: List[Tuple[str, Dict]],
+                        retry_on_session_error: bool = True) -> List[Optional[Any]]:
+        """
+        Make several JSON-RPC API requests in a single HTTP POST.
+        
+        Uses the JSON-RPC 2.0 array form: one request body holding many
+        calls, answered by one response array matched back by id.
+        
+        Args:
+            endpoint: API endpoint URL (shared by every call in the batch)
+            calls: List of (method, params) tuples
+            retry_on_session_error: If True, attempt re-login on session error
+            
+        Returns:
+            List of results in the same order as calls (None for failed calls)
+        """
+        if not calls:
+            return []
+        
+        # Retry at most once, after re-login on an expired session
+        attempts = 2 if retry_on_session_error else 1
+        
+        for attempt in range(attempts):
+            results: List[Optional[Any]] = [None] * len(calls)
+            
+            if not self.session_token:
+                logger.error("Not logged in. Call login() first.")
+                return results
+            
+            self._refresh_session_if_expiring()
+            self._enforce_rate_limit(sum(self.METHOD_COSTS.get(method, 1) for method, _ in calls))
+            
+            payload = b'[' + b','.join(
+                _encode_rpc_call(method, params, call_id)
+                for call_id, (method, params) in enumerate(calls)
+            ) + b']'
+            
+            try:
+                response = self._session.post(
+                    endpoint,
+                    data=payload,
+                    timeout=30
+                )
                 
-        except Exception as e:
-            logger.error(f"API request error: {str(e)}")
+                self._track_rate_limit_headers(response)
+                
+                if response.status_code == 429:
+                    self._decrease_rate()
+                    self._wait_retry_after(response)
+                    return results
+                elif response.status_code != 200:
+                    logger.error("API batch request failed: %s", response.status_code)
+                    return results
+                
+                resp_json = orjson.loads(response.content)
+                if isinstance(resp_json, dict):
+                    resp_json = [resp_json]
+                
+                session_expired = False
+                rate_limited = False
+                
+                for entry in resp_json:
+                    call_id = entry.get('id')
+                    
+                    if 'result' in entry and isinstance(call_id, int) and 0 <= call_id < len(calls):
+                        results[call_id] = entry['result']
+                    elif 'error' in entry:
+                        error = entry['error']
+                        error_code = error.get('data', {}).get('APINGException', {}).get('errorCode', '')
+                        
+                        if error_code == 'INVALID_SESSION_INFORMATION':
+                            session_expired = True
+                        elif error_code in self.RATE_LIMIT_ERROR_CODES:
+                            rate_limited = True
+                        else:
+                            logger.error("API error (batch call %s): %s", call_id, error)
+                
+                if rate_limited:
+                    self._decrease_rate()
+                    self._wait_retry_after(response)
+                elif not session_expired:
+                    self._increase_rate()
+                
+                if session_expired and attempt + 1 < attempts:
+                    logger.warning("Session expired, attempting to re-login...")
+                    if self.login():
+                        logger.info("✓ Re-login successful, retrying batch...")
+                        continue
+                    logger.error("Re-login failed")
+                
+                return results
+                
+            except Exception as e:
+                logger.error("API batch request error: %s", e)
+                return results
+        
+        return results
+    
+    def _get_event_type_id(self, name: str) -> Optional[str]:
+        """
+        Get the event type ID whose name contains the given text.
+        
+        The listEventTypes response is cached for EVENT_TYPE_CACHE_TTL_SECONDS
+        so repeated race scans don't pay an extra RPC each time.
+        
+        Args:
+            name: Text to match against event type names (e.g. 'Greyhound')
+            
+        Returns:
+            Event type ID or None if not found
+        """
+        now = time.monotonic()
+        
+        for event_type_name, (event_type_id, fetched_at) in self._event_type_cache.items():
+            if name in event_type_name and now - fetched_at < self.EVENT_TYPE_CACHE_TTL_SECONDS:
+                return event_type_id
+        
+        event_types = self._make_api_request(
+            self.BETTING_URL,
+            'SportsAPING/v1.0/listEventTypes',
+            params={'filter': {}}
+        )
+        
+        if not event_types:
             return None
+        
+        self._event_type_cache = {
+            event_type['eventType']['name']: (event_type['eventType']['id'], now)
+            for event_type in event_types
+        }
+        
+        for event_type_name, (event_type_id, _) in self._event_type_cache.items():
+            if name in event_type_name:
+                return event_type_id
+        
+        return None
     
     def get_upcoming_greyhound_races(self, hours_ahead: float = 24, 
                                      country_codes: List[str] = None) -> List[Dict]:
@@ -322,32 +629,19 @@ class BetfairClient:
             country_codes = ['GB']
         
         # Get greyhound event type ID
-        event_types = self._make_api_request(
-            self.BETTING_URL,
-            'SportsAPING/v1.0/listEventTypes',
-            params={'filter': {}}
-        )
-        
-        if not event_types:
-            return []
-        
-        greyhound_id = None
-        for event_type in event_types:
-            if 'Greyhound' in event_type['eventType']['name']:
-                greyhound_id = event_type['eventType']['id']
-                break
+        greyhound_id = self._get_event_type_id('Greyhound')
         
         if not greyhound_id:
             logger.warning("Greyhound racing event type not found")
             return []
         
         # Build time filter
-        now = datetime.utcnow()
-        to_time = now + timedelta(hours=hours_ahead)
+        now = time.time_ns() // 1_000_000_000
+        to_time = now + int(hours_ahead * 3600)
         
         time_filter = {
-            'from': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'to': to_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+            'from': _format_utc_iso(now),
+            'to': _format_utc_iso(to_time)
         }
         
         # Build market filter
@@ -380,57 +674,80 @@ class BetfairClient:
             return []
         
         # Parse races
-        races = []
-        for market in result:
-            race_info = {
+        races = [
+            {
                 'market_id': market['marketId'],
                 'market_name': market['marketName'],
                 'event_name': market['event']['name'],
                 'venue': market['event']['venue'],
                 'country_code': market['event'].get('countryCode', 'Unknown'),
                 'race_time': market['marketStartTime'],
-                'num_runners': len(market.get('runners', []))
+                'num_runners': len(market.get('runners') or ())
             }
-            races.append(race_info)
+            for market in result
+        ]
         
-        logger.info(f"Found {len(races)} upcoming GB greyhound races")
+        logger.info("Found %d upcoming GB greyhound races", len(races))
         return races
     
     def get_market_book(self, market_ids: List[str]) -> Optional[List[Dict]]:
         """Get current market prices and status."""
-        price_projection = {
-            'priceData': ['EX_BEST_OFFERS', 'SP_AVAILABLE', 'SP_TRADED'],
-            'virtualise': True
-        }
-        
         result = self._make_api_request(
             self.BETTING_URL,
             'SportsAPING/v1.0/listMarketBook',
             params={
                 'marketIds': market_ids,
-                'priceProjection': price_projection
+                'priceProjection': self.MARKET_BOOK_PRICE_PROJECTION
             }
         )
         
         return result
     
+    def get_market_books(self, market_ids: List[str], max_workers: int = 8) -> List[Dict]:
+        """
+        Get market books for any number of markets.
+        
+        Splits market_ids into chunks Betfair accepts in a single
+        listMarketBook call and fetches the chunks concurrently over the
+        pooled HTTP session. The shared token bucket still applies.
+        
+        Args:
+            market_ids: Market IDs to fetch
+            max_workers: Maximum number of concurrent requests
+            
+        Returns:
+            Market books for all markets that could be fetched
+        """
+        chunks = [
+            market_ids[i:i + self.MARKET_BOOK_CHUNK_SIZE]
+            for i in range(0, len(market_ids), self.MARKET_BOOK_CHUNK_SIZE)
+        ]
+        
+        if not chunks:
+            return []
+        
+        if len(chunks) == 1:
+            return self.get_market_book(chunks[0]) or []
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            chunk_results = list(executor.map(self.get_market_book, chunks))
+        
+        return [book for books in chunk_results if books for book in books]
+    
     def logout(self):
         """Logout and invalidate session token."""
         if self.session_token:
             try:
-                headers = {
-                    'X-Application': self.app_key,
-                    'X-Authentication': self.session_token
-                }
-                
-                requests.post(
+                self._session.post(
                     "https://identitysso.betfair.com/api/logout",
-                    headers=headers,
                     timeout=10
                 )
                 
                 logger.info("Logged out from Betfair")
             except Exception as e:
-                logger.error(f"Logout error: {str(e)}")
+                logger.error("Logout error: %s", e)
             
             self.session_token = None
+            self._session.headers.pop('X-Authentication', None)
+        
+        self._session.close()
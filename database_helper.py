@@ -4,43 +4,180 @@ Database Helper for GB Track Specialist
 PostgreSQL integration with fallback to JSON logging
 """
 
-import psycopg2
-from psycopg2.extras import execute_values, RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
-from typing import Dict, List, Optional
+import pandas as pd
+from typing import Dict, List, Optional, Iterator, TYPE_CHECKING
+from contextlib import contextmanager
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, date
 import json
+import io
+import hashlib
+import queue
+import threading
+import time
 from pathlib import Path
 
+if TYPE_CHECKING:
+    import psycopg2.extensions
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _lazy_psycopg():
+    """
+    Import psycopg2 on first use.
+    
+    Only needed once a DATABASE_URL is configured, so JSON-only runs never
+    pay for loading the driver.
+    """
+    import psycopg2
+    import psycopg2.extras
+    import psycopg2.pool
+    return psycopg2
+
+# Target columns of the predictions INSERT, in record order
+PREDICTION_INSERT_COLUMNS = [
+    'market_id', 'selection_id', 'runner_name',
+    'venue', 'race_time', 'race_date', 'race_hour', 'race_day_of_week', 'is_weekend',
+    'distance', 'race_grade',
+    'trap', 'runner_odds',
+    'win_probability',
+    'field_size', 'market_compression', 'favorite_dominance',
+    'num_competitive', 'longshot', 'weak_favorite', 'dominant_favorite', 'competitive_field',
+    'predicted_profit',
+    'features',
+    'session_id', 'system'
+]
+
+# DataFrame columns feeding predictions columns whose names differ
+PREDICTION_COLUMN_SOURCES = {
+    'selection_id': 'runner_id',
+    'trap': 'runner_box',
+    'win_probability': 'calibrated_prob'
+}
+
+# DataFrame column for each INSERT column, in record order
+PREDICTION_SOURCE_COLUMNS = [PREDICTION_COLUMN_SOURCES.get(col, col) for col in PREDICTION_INSERT_COLUMNS]
+
+# Features stored together in the predictions.features JSONB column
+PREDICTION_FEATURE_COLUMNS = [
+    'venue_abbr', 'race_category', 'country_code',
+    'base_prob', 'runner_implied_prob',
+    'favorite_bsp', 'mean_bsp', 'bsp_std', 'second_favorite_bsp',
+    'runner_log_odds', 'runner_odds_rank',
+    'odds_vs_favorite_diff', 'odds_vs_favorite_ratio',
+    'odds_vs_mean_diff', 'odds_vs_mean_ratio',
+    'odds_vs_second_diff', 'odds_vs_second_ratio',
+    'odds_std', 'odds_range', 'odds_cv',
+    'box_position_score', 'box_inside', 'box_middle', 'box_outside',
+    'prob_spread', 'favorite_prob', 'prob_odds_gap',
+    'rank_by_prob', 'rank_discrepancy', 'is_favorite', 'is_longshot',
+    'competitive_runners', 'is_competitive_field'
+]
+
+# Decimal places kept for floats in the features JSON (matches the DECIMAL(10,6) columns)
+PREDICTION_FEATURE_PRECISION = 6
+
+# Defaults for optional columns the predictor may not emit
+PREDICTION_DEFAULTS = {
+    'country_code': 'GB',
+    'system': 'gb_track_specialist',
+    'longshot': False,
+    'weak_favorite': False,
+    'dominant_favorite': False,
+    'competitive_field': False,
+    'box_inside': False,
+    'box_middle': False,
+    'box_outside': False,
+    'is_favorite': False,
+    'is_longshot': False,
+    'is_competitive_field': False
+}
+
+# Hot single-row statements, prepared once per server connection
+PREPARED_STATEMENTS = {
+    'log_session_stmt': """
+        INSERT INTO sessions (
+            session_id, dry_run, scan_interval_minutes,
+            target_minutes_before_race, system_version,
+            python_version, deployment_env
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7)
+        ON CONFLICT (session_id) DO NOTHING
+    """,
+    'log_bet_stmt': """
+        INSERT INTO bets (
+            bet_id, market_id, selection_id, runner_name, runner_odds, trap,
+            stake, status, strategy, strategy_subtype,
+            win_probability, expected_value,
+            venue, race_time, race_grade, distance,
+            session_id, system, dry_run
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19)
+        ON CONFLICT (bet_id) DO NOTHING
+    """
+}
+
+# Column migrations for tables created by older schema versions. Applied in
+# their own transaction before database_schema.sql, so its views see the new
+# columns; tables created before the features column existed keep their
+# legacy per-feature columns (left NULL for new rows)
+SCHEMA_MIGRATIONS = [
+    "ALTER TABLE IF EXISTS predictions ADD COLUMN IF NOT EXISTS features JSONB",
+]
+
+
 class DatabaseHelper:
     """
     PostgreSQL database helper with connection pooling and JSON fallback.
     """
     
-    def __init__(self, database_url: Optional[str] = None, pool_size: int = 5):
+    # Connection pool bounds (overridable via DB_POOL_MIN / DB_POOL_MAX)
+    DEFAULT_POOL_MIN = 2
+    DEFAULT_POOL_MAX = 25
+    
+    # Write-behind batching
+    WRITE_BATCH_INTERVAL_SECONDS = 0.5
+    WRITE_BATCH_MAX_ITEMS = 500
+    
+    # Queued write kinds -> cursor-level writer methods
+    WRITE_OPERATIONS = {
+        'session': '_insert_session',
+        'races': '_insert_races',
+        'predictions': '_insert_predictions',
+        'bet': '_insert_bet',
+        'result': '_update_race_result'
+    }
+    
+    def __init__(self, database_url: Optional[str] = None, pool_size: Optional[int] = None):
         """
         Initialize database connection.
         
         Args:
             database_url: PostgreSQL connection string (or from env)
-            pool_size: Connection pool size
+            pool_size: Maximum pool size (or DB_POOL_MAX from env)
         """
         self.database_url = database_url or os.getenv('DATABASE_URL')
         self.pool = None
         self.connected = False
         
+        # Prepared statement names per server backend PID
+        self._prepared: Dict[int, set] = {}
+        
+        # Write-behind queue (started once connected)
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer_thread: Optional[threading.Thread] = None
+        
         if self.database_url:
             try:
-                self.pool = SimpleConnectionPool(1, pool_size, self.database_url)
+                max_conn = pool_size or int(os.getenv('DB_POOL_MAX', self.DEFAULT_POOL_MAX))
+                min_conn = min(int(os.getenv('DB_POOL_MIN', self.DEFAULT_POOL_MIN)), max_conn)
+                psycopg2 = _lazy_psycopg()
+                self.pool = psycopg2.pool.ThreadedConnectionPool(min_conn, max_conn, self.database_url)
                 self.connected = True
                 logger.info("✓ Connected to PostgreSQL database")
                 self._initialize_schema()
+                self._start_writer()
             except Exception as e:
                 logger.warning(f"Could not connect to database: {str(e)}")
                 logger.warning("Falling back to JSON-only logging")
@@ -48,340 +185,524 @@ class DatabaseHelper:
         else:
             logger.warning("No DATABASE_URL found - using JSON-only logging")
     
+    @contextmanager
+    def _conn(self) -> Iterator['psycopg2.extensions.connection']:
+        """
+        Check out a pooled connection, rolling back on error.
+        
+        The connection is always returned to the pool, without an open
+        transaction left behind if the block raised.
+        """
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+    
+    @contextmanager
+    def _cursor(self) -> Iterator['psycopg2.extensions.cursor']:
+        """
+        Yield a cursor on a pooled connection as one transaction.
+        
+        Commits when the block exits cleanly; on error the connection is
+        rolled back before it goes back to the pool.
+        """
+        with self._conn() as conn:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+    
     def _initialize_schema(self):
-        """Initialize database schema if needed."""
+        """
+        Initialize database schema if needed.
+        
+        The schema file's SHA-256 is recorded in _schema_version once applied,
+        so later boots skip re-running it until the file changes.
+        """
         try:
             schema_file = Path(__file__).parent / 'database_schema.sql'
             if schema_file.exists():
-                conn = self.pool.getconn()
-                try:
-                    with conn.cursor() as cur:
-                        with open(schema_file, 'r') as f:
-                            cur.execute(f.read())
-                        conn.commit()
-                    logger.info("✓ Database schema initialized")
-                finally:
-                    self.pool.putconn(conn)
+                schema_sql = schema_file.read_text()
+                schema_hash = hashlib.sha256(schema_sql.encode()).hexdigest()
+                
+                with self._cursor() as cur:
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS _schema_version (
+                            hash TEXT PRIMARY KEY,
+                            applied_at TIMESTAMPTZ DEFAULT NOW()
+                        )
+                    """)
+                    cur.execute("SELECT 1 FROM _schema_version WHERE hash = %s", (schema_hash,))
+                    if cur.fetchone():
+                        logger.info("✓ Database schema up to date")
+                        return
+                
+                # Bring existing tables up to date first (no-ops on a fresh database)
+                with self._cursor() as cur:
+                    for migration in SCHEMA_MIGRATIONS:
+                        cur.execute(migration)
+                
+                with self._cursor() as cur:
+                    cur.execute(schema_sql)
+                    cur.execute(
+                        "INSERT INTO _schema_version (hash) VALUES (%s) ON CONFLICT (hash) DO NOTHING",
+                        (schema_hash,)
+                    )
+                logger.info("✓ Database schema initialized")
         except Exception as e:
             logger.error(f"Error initializing schema: {str(e)}")
     
-    def log_session_start(self, session_data: Dict) -> bool:
+    def _execute_prepared(self, cur, name: str, params: tuple):
+        """
+        Execute a statement from PREPARED_STATEMENTS, preparing it on first use.
+        
+        Prepared names are tracked per backend PID, so a connection the pool
+        replaces starts from a clean slate.
+        
+        Args:
+            cur: Open cursor on a pooled connection
+            name: Key into PREPARED_STATEMENTS
+            params: Statement parameters, in order
+        """
+        pid = cur.connection.info.backend_pid
+        placeholders = ', '.join(['%s'] * len(params))
+        try:
+            prepared = self._prepared.get(pid)
+            if prepared is None:
+                # Unknown or reset backend - drop anything left over from before
+                cur.execute("DEALLOCATE ALL")
+                prepared = self._prepared[pid] = set()
+            
+            if name not in prepared:
+                cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+                prepared.add(name)
+            
+            cur.execute(f"EXECUTE {name} ({placeholders})", params)
+        except Exception:
+            # A failed transaction may have taken the PREPARE with it
+            self._prepared.pop(pid, None)
+            raise
+    
+    @contextmanager
+    def transaction(self) -> Iterator['psycopg2.extensions.connection']:
+        """
+        Hold one pooled connection for a group of writes and commit once.
+        
+        Pass the yielded connection as conn= to the log_* / update_* methods;
+        they then write straight onto it (no write-behind queue, no
+        intermediate commits). Each write still runs under a savepoint, so a
+        failed one is logged and skipped without aborting the transaction.
+        
+        Example:
+            with db.transaction() as conn:
+                db.log_session_start(session_data, conn=conn)
+                db.log_races_bulk(races, conn=conn)
+                db.log_predictions(predictions_df, session_id, conn=conn)
+        """
+        with self._conn() as conn:
+            yield conn
+            conn.commit()
+    
+    def log_session_start(self, session_data: Dict, conn=None) -> bool:
         """Log session start."""
         if not self.connected:
             return False
         
+        if conn is not None:
+            return self._submit('session', (dict(session_data),), conn)
+        
         try:
-            conn = self.pool.getconn()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO sessions (
-                            session_id, dry_run, scan_interval_minutes,
-                            target_minutes_before_race, system_version,
-                            python_version, deployment_env
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (session_id) DO NOTHING
-                    """, (
-                        session_data['session_id'],
-                        session_data.get('dry_run', True),
-                        session_data.get('scan_interval_minutes'),
-                        session_data.get('target_minutes_before_race'),
-                        session_data.get('system_version'),
-                        session_data.get('python_version'),
-                        session_data.get('deployment_env', 'local')
-                    ))
-                    conn.commit()
-                return True
-            finally:
-                self.pool.putconn(conn)
+            with self._cursor() as cur:
+                self._insert_session(cur, session_data)
+            return True
         except Exception as e:
             logger.error(f"Error logging session start: {str(e)}")
             return False
     
-    def log_race(self, race_data: Dict) -> bool:
-        """Log race metadata."""
-        if not self.connected:
+    def log_race(self, race_data: Dict, conn=None) -> bool:
+        """Queue race metadata for the background writer (or write it on conn)."""
+        return self.log_races_bulk([race_data], conn=conn)
+    
+    def log_races_bulk(self, races: List[Dict], conn=None) -> bool:
+        """
+        Queue metadata for many races; the writer upserts them in one statement.
+        
+        Args:
+            races: List of race dicts (same shape as log_race)
+            conn: Connection from transaction() to write on directly
+        """
+        if not self.connected or not races:
             return False
         
         try:
-            conn = self.pool.getconn()
-            try:
-                with conn.cursor() as cur:
-                    # Parse race time
-                    race_time = datetime.fromisoformat(race_data['race_time'].replace('Z', '+00:00'))
-                    
-                    cur.execute("""
-                        INSERT INTO races (
-                            market_id, market_name, event_name, venue, country_code,
-                            race_time, race_date,  race_hour, race_day_of_week, is_weekend,
-                            distance, race_grade, num_runners, status, session_id, system
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (market_id) DO UPDATE SET
-                            status = EXCLUDED.status,
-                            updated_at = NOW()
-                    """, (
-                        race_data['market_id'],
-                        race_data.get('market_name'),
-                        race_data.get('event_name'),
-                        race_data['venue'],
-                        race_data.get('country_code', 'GB'),
-                        race_time,
-                        race_time.date(),
-                        race_time.hour,
-                        race_time.weekday(),
-                        race_time.weekday() >= 5,
-                        race_data.get('distance'),
-                        race_data.get('race_grade'),
-                        len(race_data.get('runners', [])),
-                        race_data.get('status'),
-                        race_data.get('session_id'),
-                        race_data.get('system', 'gb_track_specialist')
-                    ))
-                    conn.commit()
-                return True
-            finally:
-                self.pool.putconn(conn)
+            return self._submit('races', (self._race_rows(races),), conn)
         except Exception as e:
-            logger.error(f"Error logging race: {str(e)}")
+            logger.error(f"Error logging races: {str(e)}")
             return False
     
-    def log_predictions(self, predictions_df, session_id: str) -> bool:
+    def log_predictions(self, predictions_df, session_id: str, conn=None) -> bool:
         """
-        Log ALL predictions with complete feature set.
+        Queue ALL predictions with complete feature set for the background writer.
         
         Args:
             predictions_df: DataFrame with ALL CatBoost features
             session_id: Session identifier
+            conn: Connection from transaction() to write on directly
         """
         if not self.connected or predictions_df is None or len(predictions_df) == 0:
             return False
         
         try:
-            conn = self.pool.getconn()
-            try:
-                # Convert DataFrame to records
-                records = []
-                for _, row in predictions_df.iterrows():
-                    # Parse race time
-                    race_time = datetime.fromisoformat(row['race_time'].replace('Z', '+00:00'))
-                    
-                    record = (
-                        row['market_id'],
-                        row['runner_id'],
-                        row['runner_name'],
-                        row.get('venue'),
-                        row.get('venue_abbr'),
-                        race_time,
-                        race_time.date(),
-                        race_time.hour,
-                        race_time.weekday(),
-                        race_time.weekday() >= 5,
-                        row.get('distance'),
-                        row.get('race_grade'),
-                        row.get('race_category'),
-                        row.get('country_code', 'GB'),
-                        row.get('runner_box'),
-                        row.get('runner_odds'),
-                        row.get('runner_box'),
-                        row.get('calibrated_prob'),
-                        row.get('base_prob'),
-                        row.get('base_prob'),
-                        row.get('calibrated_prob'),
-                        row.get('runner_implied_prob'),
-                        row.get('field_size'),
-                        row.get('favorite_bsp'),
-                        row.get('mean_bsp'),
-                        row.get('bsp_std'),
-                        row.get('second_favorite_bsp'),
-                        row.get('runner_log_odds'),
-                        row.get('runner_odds_rank'),
-                        row.get('odds_vs_favorite_diff'),
-                        row.get('odds_vs_favorite_ratio'),
-                        row.get('odds_vs_mean_diff'),
-                        row.get('odds_vs_mean_ratio'),
-                        row.get('odds_vs_second_diff'),
-                        row.get('odds_vs_second_ratio'),
-                        row.get('market_compression'),
-                        row.get('favorite_dominance'),
-                        row.get('odds_std'),
-                        row.get('odds_range'),
-                        row.get('odds_cv'),
-                        row.get('num_competitive'),
-                        row.get('longshot', False),
-                        row.get('weak_favorite', False),
-                        row.get('dominant_favorite', False),
-                        row.get('competitive_field', False),
-                        row.get('box_position_score'),
-                        row.get('box_inside', False),
-                        row.get('box_middle', False),
-                        row.get('box_outside', False),
-                        row.get('predicted_profit'),
-                        row.get('prob_spread'),
-                        row.get('favorite_prob'),
-                        row.get('prob_odds_gap'),
-                        row.get('rank_by_prob'),
-                        row.get('rank_discrepancy'),
-                        row.get('is_favorite', False),
-                        row.get('is_longshot', False),
-                        row.get('competitive_runners'),
-                        row.get('is_competitive_field', False),
-                        session_id,
-                        row.get('system', 'gb_track_specialist')
-                    )
-                    records.append(record)
-                
-                # Bulk insert
-                with conn.cursor() as cur:
-                    execute_values(cur, """
-                        INSERT INTO predictions (
-                            market_id, selection_id, runner_name,
-                            venue, venue_abbr, race_time, race_date, race_hour, race_day_of_week, is_weekend,
-                            distance, race_grade, race_category, country_code,
-                            trap, runner_odds, runner_box,
-                            win_probability, win_probability_raw, base_prob, calibrated_prob, runner_implied_prob,
-                            field_size, favorite_bsp, mean_bsp, bsp_std, second_favorite_bsp,
-                            runner_log_odds, runner_odds_rank,
-                            odds_vs_favorite_diff, odds_vs_favorite_ratio,
-                            odds_vs_mean_diff, odds_vs_mean_ratio,
-                            odds_vs_second_diff, odds_vs_second_ratio,
-                            market_compression, favorite_dominance, odds_std, odds_range, odds_cv,
-                            num_competitive, longshot, weak_favorite, dominant_favorite, competitive_field,
-                            box_position_score, box_inside, box_middle, box_outside,
-                            predicted_profit, prob_spread, favorite_prob, prob_odds_gap,
-                            rank_by_prob, rank_discrepancy, is_favorite, is_longshot,
-                            competitive_runners, is_competitive_field,
-                            session_id, system
-                        ) VALUES %s
-                        ON CONFLICT (market_id, selection_id) DO NOTHING
-                    """, records)
-                    conn.commit()
-                
-                logger.info(f"✓ Logged {len(records)} predictions to database")
-                return True
-                
-            finally:
-                self.pool.putconn(conn)
+            return self._submit('predictions', (self._prediction_records(predictions_df, session_id),), conn)
         except Exception as e:
-            logger.error(f"Error logging predictions: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error logging predictions: {str(e)}")
             return False
     
-    def log_bet(self, bet_data: Dict) -> bool:
-        """Log a placed bet."""
+    def log_bet(self, bet_data: Dict, conn=None) -> bool:
+        """Queue a placed bet for the background writer (or write it on conn)."""
         if not self.connected:
             return False
         
-        try:
-            conn = self.pool.getconn()
-            try:
-                with conn.cursor() as cur:
-                    race_time = datetime.fromisoformat(bet_data['race_time'].replace('Z', '+00:00')) if 'race_time' in bet_data else None
-                    
-                    cur.execute("""
-                        INSERT INTO bets (
-                            bet_id, market_id, selection_id, runner_name, runner_odds, trap,
-                            stake, status, strategy, strategy_subtype,
-                            win_probability, expected_value,
-                            venue, race_time, race_grade, distance,
-                            session_id, system, dry_run
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (bet_id) DO NOTHING
-                    """, (
-                        bet_data['bet_id'],
-                        bet_data['market_id'],
-                        bet_data['selection_id'],
-                        bet_data.get('runner_name'),
-                        bet_data.get('runner_odds'),
-                        bet_data.get('trap'),
-                        bet_data['stake'],
-                        bet_data.get('status'),
-                        bet_data.get('strategy'),
-                        bet_data.get('strategy_subtype'),
-                        bet_data.get('win_probability'),
-                        bet_data.get('expected_value'),
-                        bet_data.get('venue'),
-                        race_time,
-                        bet_data.get('race_grade'),
-                        bet_data.get('distance'),
-                        bet_data.get('session_id'),
-                        bet_data.get('system', 'gb_track_specialist'),
-                        bet_data.get('dry_run', True)
-                    ))
-                    conn.commit()
-                return True
-            finally:
-                self.pool.putconn(conn)
-        except Exception as e:
-            logger.error(f"Error logging bet: {str(e)}")
-            return False
+        return self._submit('bet', (dict(bet_data),), conn)
     
-    def update_race_result(self, market_id: str, winner_data: Dict) -> bool:
-        """Update race with result."""
+    def update_race_result(self, market_id: str, winner_data: Dict, conn=None) -> bool:
+        """
+        Queue a race result for the background writer.
+        
+        Results go through the same queue as the inserts, so they are applied
+        after the race's predictions and bets have been written.
+        """
         if not self.connected:
             return False
         
+        return self._submit('result', (market_id, dict(winner_data)), conn)
+    
+    # =========================================================================
+    # Write-behind queue
+    # =========================================================================
+    
+    def _start_writer(self):
+        """Start the background thread that drains the write queue."""
+        self._write_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer_thread.start()
+    
+    def _submit(self, kind: str, args: tuple, conn=None) -> bool:
+        """
+        Hand a write to the background writer, or apply it on conn right away.
+        
+        Args:
+            kind: Key into WRITE_OPERATIONS
+            args: Arguments for the cursor-level writer
+            conn: Connection from transaction(), or None to queue
+        """
+        if conn is not None:
+            with conn.cursor() as cur:
+                return self._apply_write(cur, kind, args)
+        
+        self._write_queue.put((kind, args))
+        return True
+    
+    def _apply_write(self, cur, kind: str, args: tuple) -> bool:
+        """Run one cursor-level writer under a savepoint; log and skip it on error."""
+        cur.execute("SAVEPOINT write_op")
         try:
-            conn = self.pool.getconn()
+            getattr(self, self.WRITE_OPERATIONS[kind])(cur, *args)
+            cur.execute("RELEASE SAVEPOINT write_op")
+            return True
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT write_op")
+            logger.error(f"Error writing {kind}: {str(e)}")
+            return False
+    
+    def flush(self):
+        """Block until every queued write has been committed (or logged as failed)."""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            self._write_queue.join()
+    
+    def _writer_loop(self):
+        """Collect queued writes for up to WRITE_BATCH_INTERVAL_SECONDS and commit them together."""
+        running = True
+        while running:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + self.WRITE_BATCH_INTERVAL_SECONDS
+            while len(batch) < self.WRITE_BATCH_MAX_ITEMS and batch[-1][0] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            
+            if batch[-1][0] is None:
+                running = False
+            
             try:
-                with conn.cursor() as cur:
-                    # Update race table
-                    cur.execute("""
-                        UPDATE races SET
-                            winner_selection_id = %s,
-                            winner_name = %s,
-                            winner_odds = %s,
-                            result_checked_time = NOW(),
-                            updated_at = NOW()
-                        WHERE market_id = %s
-                    """, (
-                        winner_data.get('selection_id'),
-                        winner_data.get('runner_name'),
-                        winner_data.get('odds'),
-                        market_id
-                    ))
-                    
-                    # Update predictions table
-                    cur.execute("""
-                        UPDATE predictions SET
-                            won = (selection_id = %s),
-                            actual_winner_selection_id = %s,
-                            actual_winner_name = %s,
-                            actual_winner_odds = %s,
-                            result_checked_time = NOW()
-                        WHERE market_id = %s
-                    """, (
-                        winner_data.get('selection_id'),
-                        winner_data.get('selection_id'),
-                        winner_data.get('runner_name'),
-                        winner_data.get('odds'),
-                        market_id
-                    ))
-                    
-                    # Update bets table
-                    cur.execute("""
-                        UPDATE bets SET
-                            won = (selection_id = %s),
-                            winner_selection_id = %s,
-                            returns = CASE WHEN selection_id = %s THEN stake * runner_odds ELSE 0 END,
-                            profit = CASE WHEN selection_id = %s THEN (stake * runner_odds) - stake ELSE -stake END,
-                            result_checked_time = NOW()
-                        WHERE market_id = %s
-                    """, (
-                        winner_data.get('selection_id'),
-                        winner_data.get('selection_id'),
-                        winner_data.get('selection_id'),
-                        winner_data.get('selection_id'),
-                        market_id
-                    ))
-                    
-                    conn.commit()
-                return True
+                self._write_batch([item for item in batch if item[0] is not None])
             finally:
-                self.pool.putconn(conn)
+                for _ in batch:
+                    self._write_queue.task_done()
+    
+    def _write_batch(self, batch: List[tuple]):
+        """
+        Write a batch of queued operations in a single transaction.
+        
+        Consecutive race upserts and prediction inserts are merged into one
+        statement each. Every operation runs under a savepoint so one bad row
+        doesn't discard the rest of the batch.
+        """
+        if not batch:
+            return
+        
+        # Merge runs of race rows / prediction records (the lists are ours, built at enqueue time)
+        ops = []
+        for kind, args in batch:
+            if kind in ('races', 'predictions') and ops and ops[-1][0] == kind:
+                ops[-1][1][0].extend(args[0])
+            else:
+                ops.append((kind, args))
+        
+        try:
+            with self._cursor() as cur:
+                for kind, args in ops:
+                    self._apply_write(cur, kind, args)
         except Exception as e:
-            logger.error(f"Error updating race result: {str(e)}")
-            return False
+            logger.error(f"Error committing write batch ({len(ops)} operations): {str(e)}")
+    
+    # =========================================================================
+    # Row builders and cursor-level writers
+    # =========================================================================
+    
+    @staticmethod
+    def _race_rows(races: List[Dict]) -> List[tuple]:
+        """Build races INSERT rows, parsing race times once for the whole batch."""
+        race_times = pd.to_datetime(
+            [race_data['race_time'] for race_data in races], utc=True, format='ISO8601'
+        )
+        
+        rows = []
+        for race_data, race_time in zip(races, race_times):
+            weekday = race_time.weekday()
+            rows.append((
+                race_data['market_id'],
+                race_data.get('market_name'),
+                race_data.get('event_name'),
+                race_data['venue'],
+                race_data.get('country_code', 'GB'),
+                race_time.to_pydatetime(),
+                race_time.date(),
+                race_time.hour,
+                weekday,
+                weekday >= 5,
+                race_data.get('distance'),
+                race_data.get('race_grade'),
+                len(race_data.get('runners', [])),
+                race_data.get('status'),
+                race_data.get('session_id'),
+                race_data.get('system', 'gb_track_specialist')
+            ))
+        return rows
+    
+    @staticmethod
+    def _prediction_records(predictions_df, session_id: str) -> List[tuple]:
+        """Project a predictions DataFrame onto PREDICTION_INSERT_COLUMNS record tuples."""
+        # Project the columns in INSERT order (missing optional columns become NULL)
+        df = predictions_df.reindex(
+            columns=list(dict.fromkeys(PREDICTION_SOURCE_COLUMNS + PREDICTION_FEATURE_COLUMNS))
+        )
+        for col, default in PREDICTION_DEFAULTS.items():
+            if col not in predictions_df.columns:
+                df[col] = default
+        
+        # Encode the feature block as one JSON document per row (NaN -> null)
+        df['features'] = (
+            df[PREDICTION_FEATURE_COLUMNS]
+            .to_json(orient='records', lines=True, double_precision=PREDICTION_FEATURE_PRECISION)
+            .rstrip('\n')
+            .split('\n')
+        )
+        
+        # Parse race times once for the whole frame
+        race_time = pd.to_datetime(df['race_time'], utc=True, format='ISO8601')
+        weekday = race_time.dt.weekday.astype('int8')
+        df['race_time'] = race_time
+        df['race_date'] = race_time.dt.date
+        df['race_hour'] = race_time.dt.hour.astype('int16')
+        df['race_day_of_week'] = weekday
+        df['is_weekend'] = weekday >= 5
+        df['session_id'] = session_id
+        
+        # Traps are float (NaN = unknown) in the features; the column is INTEGER
+        df['runner_box'] = df['runner_box'].astype('Int64')
+        
+        # Convert DataFrame to records (plain tuples, NaN -> NULL)
+        df = df.astype(object)
+        df = df.where(df.notna(), None)
+        return list(df[PREDICTION_SOURCE_COLUMNS].itertuples(index=False, name=None))
+    
+    def _insert_session(self, cur, session_data: Dict):
+        """Insert a session row."""
+        self._execute_prepared(cur, 'log_session_stmt', (
+            session_data['session_id'],
+            session_data.get('dry_run', True),
+            session_data.get('scan_interval_minutes'),
+            session_data.get('target_minutes_before_race'),
+            session_data.get('system_version'),
+            session_data.get('python_version'),
+            session_data.get('deployment_env', 'local')
+        ))
+    
+    def _insert_races(self, cur, rows: List[tuple]):
+        """Upsert race rows in one statement."""
+        # One row per market - ON CONFLICT DO UPDATE can't touch a row twice
+        rows = list({row[0]: row for row in rows}.values())
+        
+        _lazy_psycopg().extras.execute_values(cur, """
+            INSERT INTO races (
+                market_id, market_name, event_name, venue, country_code,
+                race_time, race_date,  race_hour, race_day_of_week, is_weekend,
+                distance, race_grade, num_runners, status, session_id, system
+            ) VALUES %s
+            ON CONFLICT (market_id) DO UPDATE SET
+                status = EXCLUDED.status,
+                updated_at = NOW()
+        """, rows, page_size=500)
+    
+    def _insert_predictions(self, cur, records: List[tuple]):
+        """Insert prediction records, skipping runners that are already logged."""
+        # Skip runners that are already logged (e.g. a re-scan of the same races)
+        cur.execute(
+            "SELECT market_id, selection_id FROM predictions WHERE market_id = ANY(%s)",
+            (list({record[0] for record in records}),)
+        )
+        existing = set(cur.fetchall())
+        if existing:
+            records = [record for record in records if (record[0], record[1]) not in existing]
+        
+        if records:
+            self.bulk_insert_with_copy(
+                cur, 'predictions', PREDICTION_INSERT_COLUMNS, records,
+                conflict_columns=('market_id', 'selection_id')
+            )
+        
+        logger.info(f"✓ Logged {len(records)} predictions to database")
+    
+    def _insert_bet(self, cur, bet_data: Dict):
+        """Insert a single bet."""
+        race_time = datetime.fromisoformat(bet_data['race_time'].replace('Z', '+00:00')) if 'race_time' in bet_data else None
+        
+        self._execute_prepared(cur, 'log_bet_stmt', (
+            bet_data['bet_id'],
+            bet_data['market_id'],
+            bet_data['selection_id'],
+            bet_data.get('runner_name'),
+            bet_data.get('runner_odds'),
+            bet_data.get('trap'),
+            bet_data['stake'],
+            bet_data.get('status'),
+            bet_data.get('strategy'),
+            bet_data.get('strategy_subtype'),
+            bet_data.get('win_probability'),
+            bet_data.get('expected_value'),
+            bet_data.get('venue'),
+            race_time,
+            bet_data.get('race_grade'),
+            bet_data.get('distance'),
+            bet_data.get('session_id'),
+            bet_data.get('system', 'gb_track_specialist'),
+            bet_data.get('dry_run', True)
+        ))
+    
+    def _update_race_result(self, cur, market_id: str, winner_data: Dict):
+        """Update races, predictions and bets with a result in one round-trip."""
+        cur.execute("""
+            WITH upd_race AS (
+                UPDATE races SET
+                    winner_selection_id = %(sel)s,
+                    winner_name = %(name)s,
+                    winner_odds = %(odds)s,
+                    result_checked_time = NOW(),
+                    updated_at = NOW()
+                WHERE market_id = %(mid)s
+            ), upd_pred AS (
+                UPDATE predictions SET
+                    won = (selection_id = %(sel)s),
+                    actual_winner_selection_id = %(sel)s,
+                    actual_winner_name = %(name)s,
+                    actual_winner_odds = %(odds)s,
+                    result_checked_time = NOW()
+                WHERE market_id = %(mid)s
+            )
+            UPDATE bets SET
+                won = (selection_id = %(sel)s),
+                winner_selection_id = %(sel)s,
+                returns = CASE WHEN selection_id = %(sel)s THEN stake * runner_odds ELSE 0 END,
+                profit = CASE WHEN selection_id = %(sel)s THEN (stake * runner_odds) - stake ELSE -stake END,
+                result_checked_time = NOW()
+            WHERE market_id = %(mid)s
+        """, {
+            'sel': winner_data.get('selection_id'),
+            'name': winner_data.get('runner_name'),
+            'odds': winner_data.get('odds'),
+            'mid': market_id
+        })
+    
+    @staticmethod
+    def _format_value_for_copy(value) -> str:
+        """Format a single value for COPY text format."""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return (
+            str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r')
+        )
+    
+    def bulk_insert_with_copy(self, cur, table: str, columns: List[str], records: List[tuple],
+                              conflict_columns: tuple) -> None:
+        """
+        Bulk insert records via COPY FROM STDIN into a temporary staging table.
+        
+        Rows are then moved into the target table with ON CONFLICT DO NOTHING,
+        so duplicates are skipped exactly as with a plain INSERT.
+        
+        Args:
+            cur: Open cursor (the caller commits)
+            table: Target table name
+            columns: Target column names, in record order
+            records: Row tuples
+            conflict_columns: Columns of the unique constraint to skip on
+        """
+        buffer = io.StringIO()
+        for record in records:
+            buffer.write('\t'.join(self._format_value_for_copy(v) for v in record))
+            buffer.write('\n')
+        buffer.seek(0)
+        
+        column_list = ', '.join(columns)
+        stage = f"{table}_stage"
+        
+        cur.execute(f"""
+            CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+            SELECT {column_list} FROM {table} WITH NO DATA
+        """)
+        cur.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN", buffer)
+        cur.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {stage}
+            ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING
+        """)
+        cur.execute(f"DROP TABLE {stage}")
     
     def update_session_stats(self, session_id: str) -> bool:
         """Update session statistics."""
@@ -389,14 +710,10 @@ class DatabaseHelper:
             return False
         
         try:
-            conn = self.pool.getconn()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT update_session_stats(%s)", (session_id,))
-                    conn.commit()
-                return True
-            finally:
-                self.pool.putconn(conn)
+            self.flush()
+            with self._cursor() as cur:
+                cur.execute("SELECT update_session_stats(%s)", (session_id,))
+            return True
         except Exception as e:
             logger.error(f"Error updating session stats: {str(e)}")
             return False
@@ -408,23 +725,21 @@ class DatabaseHelper:
         
         try:
             self.update_session_stats(session_id)
-            conn = self.pool.getconn()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE sessions SET ended_at = NOW()
-                        WHERE session_id = %s
-                    """, (session_id,))
-                    conn.commit()
-                return True
-            finally:
-                self.pool.putconn(conn)
+            with self._cursor() as cur:
+                cur.execute("""
+                    UPDATE sessions SET ended_at = NOW()
+                    WHERE session_id = %s
+                """, (session_id,))
+            return True
         except Exception as e:
             logger.error(f"Error closing session: {str(e)}")
             return False
     
     def cleanup(self):
-        """Cleanup database connections."""
+        """Flush queued writes and cleanup database connections."""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            self._write_queue.put((None, ()))
+            self._writer_thread.join()
         if self.pool:
             self.pool.closeall()
             logger.info("Database connections closed")
@@ -14,7 +14,6 @@ CREATE TABLE IF NOT EXISTS predictions (
     
     -- Race Context
     venue VARCHAR(50),
-    venue_abbr VARCHAR(10),
     race_time TIMESTAMP NOT NULL,
     race_date DATE,
     race_hour INTEGER,
@@ -22,71 +21,29 @@ CREATE TABLE IF NOT EXISTS predictions (
     is_weekend BOOLEAN,
     distance INTEGER,
     race_grade VARCHAR(20),
-    race_category VARCHAR(20),
-    country_code VARCHAR(5) DEFAULT 'GB',
     
     -- Runner Basics
-    trap INTEGER,
+    trap INTEGER,  -- runner_box
     runner_odds DECIMAL(10,2),
-    runner_box INTEGER,  -- Same as trap
     
-    -- Probabilities (Model Outputs)
+    -- Probabilities (Model Outputs) - win_probability is the calibrated
+    -- probability; the raw/base probability lives in features->'base_prob'
     win_probability DECIMAL(10,6),
-    win_probability_raw DECIMAL(10,6),
-    base_prob DECIMAL(10,6),
-    calibrated_prob DECIMAL(10,6),
-    runner_implied_prob DECIMAL(10,6),
     
-    -- Field/Market Aggregate Features
+    -- Queried Market Features (grid search filters)
     field_size INTEGER,
-    favorite_bsp DECIMAL(10,2),
-    mean_bsp DECIMAL(10,2),
-    bsp_std DECIMAL(10,4),
-    second_favorite_bsp DECIMAL(10,2),
-    
-    -- Runner Position Features
-    runner_log_odds DECIMAL(10,4),
-    runner_odds_rank INTEGER,
-    
-    -- Odds Differentials
-    odds_vs_favorite_diff DECIMAL(10,2),
-    odds_vs_favorite_ratio DECIMAL(10,4),
-    odds_vs_mean_diff DECIMAL(10,2),
-    odds_vs_mean_ratio DECIMAL(10,4),
-    odds_vs_second_diff DECIMAL(10,2),
-    odds_vs_second_ratio DECIMAL(10,4),
-    
-    -- Market Structure Features
     market_compression DECIMAL(10,4),
     favorite_dominance DECIMAL(10,4),
-    odds_std DECIMAL(10,4),
-    odds_range DECIMAL(10,2),
-    odds_cv DECIMAL(10,4),
-    
-    -- Competitive Field Indicators
     num_competitive INTEGER,
     longshot BOOLEAN,
     weak_favorite BOOLEAN,
     dominant_favorite BOOLEAN,
     competitive_field BOOLEAN,
-    
-    -- Box Position Features
-    box_position_score DECIMAL(10,4),
-    box_inside BOOLEAN,
-    box_middle BOOLEAN,
-    box_outside BOOLEAN,
-    
-    -- Betting Optimizer Features
     predicted_profit DECIMAL(10,2),
-    prob_spread DECIMAL(10,6),
-    favorite_prob DECIMAL(10,6),
-    prob_odds_gap DECIMAL(10,6),
-    rank_by_prob INTEGER,
-    rank_discrepancy INTEGER,
-    is_favorite BOOLEAN,
-    is_longshot BOOLEAN,
-    competitive_runners INTEGER,
-    is_competitive_field BOOLEAN,
+    
+    -- Remaining CatBoost Features (odds differentials, box position,
+    -- optimizer features, ...) - read in bulk for model evaluation
+    features JSONB,
     
     -- Metadata
     prediction_time TIMESTAMP DEFAULT NOW(),
@@ -257,7 +214,10 @@ CREATE INDEX IF NOT EXISTS idx_session_started ON sessions(started_at);
 -- ==============================================================================
 
 -- View: Complete prediction data with race results
-CREATE OR REPLACE VIEW v_predictions_with_results AS
+-- (dropped first: p.* picks up columns added to predictions, and
+-- CREATE OR REPLACE cannot change an existing view's columns)
+DROP VIEW IF EXISTS v_predictions_with_results;
+CREATE VIEW v_predictions_with_results AS
 SELECT 
     p.*,
     r.winner_name as race_winner_name,
@@ -300,7 +260,7 @@ SELECT
     p.trap,
     p.runner_odds,
     p.win_probability,
-    p.calibrated_prob,
+    p.win_probability AS calibrated_prob,
     p.predicted_profit,
     -- All market features
     p.market_compression,
@@ -7,6 +7,10 @@ import os
 import sys
 from pathlib import Path
 import subprocess
+import importlib.util
+import hashlib
+import mmap
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Google Drive file IDs
 GOOGLE_DRIVE_IDS = {
@@ -20,12 +24,35 @@ MIN_SIZES = {
     'calibrator_model.cbm': 40_000_000  # 40MB minimum
 }
 
-def check_file_valid(filepath, min_size):
-    """Check if file exists and is large enough"""
+# Expected SHA-256 (hex) per model - None skips the hash check
+MODEL_SHA256 = {
+    'base_model.cbm': None,
+    'calibrator_model.cbm': None
+}
+
+def file_sha256(filepath):
+    """SHA-256 hex digest of a file, hashed through a read-only mmap"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+def check_file_valid(filepath, min_size, sha256=None):
+    """Check if file exists, is large enough and (optionally) matches its hash"""
     if not filepath.exists():
         return False
     size = filepath.stat().st_size
-    return size >= min_size
+    if size < min_size:
+        return False
+    return sha256 is None or file_sha256(filepath) == sha256.lower()
+
+def ensure_gdown():
+    """Install gdown only if it isn't already importable (it ships in requirements.txt)"""
+    if importlib.util.find_spec('gdown') is None:
+        print("Installing gdown...")
+        subprocess.run([sys.executable, "-m", "pip", "install", "-q", "gdown"], check=True)
 
 def download_from_google_drive(file_id, destination):
     """Download file from Google Drive using gdown"""
@@ -33,13 +60,11 @@ def download_from_google_drive(file_id, destination):
     print(f"  File ID: {file_id}")
     
     try:
-        # Install gdown if not available
-        subprocess.run([sys.executable, "-m", "pip", "install", "-q", "gdown"], check=True)
-        
         # Download using gdown
         import gdown
         url = f'https://drive.google.com/uc?id={file_id}'
-        gdown.download(url, str(destination), quiet=False)
+        # resume=True continues gdown's own partial (.part) download with an HTTP Range request
+        gdown.download(url, str(destination), quiet=True, resume=True)
         
         size_mb = destination.stat().st_size / (1024 * 1024)
         print(f"  ✓ Downloaded {size_mb:.1f} MB")
@@ -58,25 +83,44 @@ def main():
     
     # Check each model
     all_valid = True
+    to_download = {}
     for model_name, min_size in MIN_SIZES.items():
         model_path = ARTIFACTS_DIR / model_name
         
-        if check_file_valid(model_path, min_size):
+        if check_file_valid(model_path, min_size, MODEL_SHA256.get(model_name)):
             size_mb = model_path.stat().st_size / (1024 * 1024)
             print(f"✓ {model_name}: {size_mb:.1f} MB (valid)")
         else:
-            print(f"✗ {model_name}: Missing or too small")
+            print(f"✗ {model_name}: Missing, too small or corrupt")
             
-            # Try to download from Google Drive
             file_id = GOOGLE_DRIVE_IDS.get(model_name)
             if file_id:
-                if not download_from_google_drive(file_id, model_path):
-                    all_valid = False
+                # gdown skips the download if the (bad) file is still there
+                model_path.unlink(missing_ok=True)
+                to_download[model_name] = file_id
             else:
                 print(f"  ⚠ No Google Drive ID configured for {model_name}")
                 print(f"  Please update GOOGLE_DRIVE_IDS in download_and_setup_models.py")
                 all_valid = False
     
+    # Download missing models from Google Drive concurrently
+    if to_download:
+        ensure_gdown()
+        with ThreadPoolExecutor(max_workers=len(to_download)) as executor:
+            futures = {
+                executor.submit(download_from_google_drive, file_id, ARTIFACTS_DIR / model_name): model_name
+                for model_name, file_id in to_download.items()
+            }
+            for future in as_completed(futures):
+                model_name = futures[future]
+                model_path = ARTIFACTS_DIR / model_name
+                if not future.result():
+                    all_valid = False
+                elif not check_file_valid(model_path, MIN_SIZES[model_name], MODEL_SHA256.get(model_name)):
+                    print(f"  ✗ {model_name}: Downloaded file failed size/SHA-256 check")
+                    model_path.unlink(missing_ok=True)
+                    all_valid = False
+    
     print("=" * 70)
     
     if all_valid:
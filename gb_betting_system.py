@@ -17,13 +17,17 @@ LOGGING:
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import json
+import orjson
 import logging
 import time
 import threading
+import queue
+import heapq
 import sys
 import re
 
@@ -37,12 +41,123 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Session log files stay human-readable
+LOG_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+
+# Comprehensive grade patterns for UK/Irish greyhounds, in priority order.
+# Constant grades are returned as-is, the rest are formatted with the
+# pattern's first capture group.
+_GRADE_PATTERNS = [
+    # Australian/NZ grades
+    (r'Gr(\d+/\d+)', 'Gr{}'),
+    (r'Gr\s*(\d+)', 'Grade{}'),
+    (r'Grade\s*(\d+/\d+)', 'Gr{}'),
+    (r'Grade\s*(\d+)', 'Grade{}'),
+    
+    # Maiden/Novice/Heat
+    (r'\b(Mdn|MDN|Maiden)\b', 'Mdn'),
+    (r'\b(NVC|Novice|Nvc|Nov)\b', 'Novice'),
+    (r'\b(Heat|HT)\b', 'Heat'),
+    (r'\b(Juvenile|Juv|JUV)\b', 'Juvenile'),
+    
+    # UK/Irish A-grades (A0-A11+)
+    (r'\bA(\d{1,2})\b', 'A{}'),
+    
+    # UK/Irish D-grades (D0-D9)
+    (r'\bD(\d)\b', 'D{}'),
+    
+    # UK/Irish C-grades (C0-C9)
+    (r'\bC(\d)\b', 'C{}'),
+    
+    # UK/Irish G-grades (G5-G7)
+    (r'\bG([567])\b', 'G{}'),
+    
+    # UK/Irish M-grades (M0-M9)
+    (r'\bM(\d)\b', 'M{}'),
+    
+    # UK/Irish P-grades (P0-P9)
+    (r'\bP(\d)\b', 'P{}'),
+    
+    # Open Race / Restricted / Handicap
+    (r'\b(OR\d*)\b', '{}'),
+    (r'\b(HC)\b', 'HC'),
+    (r'\b(Rest|Restricted|RST)\b', 'Rest'),
+]
+
+
+def _fuse_grade_patterns(patterns):
+    """
+    Fuse the grade patterns into one alternation so a name is scanned once.
+    
+    Each pattern is wrapped in a named group g<priority>. Returns the compiled
+    regex and a map of group name -> (priority, grade, is_constant, index of
+    the pattern's first capture group in the fused regex).
+    """
+    parts = []
+    groups = {}
+    group_index = 1
+    for priority, (pattern, grade) in enumerate(patterns):
+        name = f"g{priority}"
+        parts.append(f"(?P<{name}>{pattern})")
+        groups[name] = (priority, grade, '{}' not in grade, group_index + 1)
+        group_index += 1 + re.compile(pattern).groups
+    return re.compile('|'.join(parts), re.IGNORECASE), groups
+
+
+_GRADE_REGEX, _GRADE_GROUPS = _fuse_grade_patterns(_GRADE_PATTERNS)
+
+# Race distance in the market name, e.g. "A6 480m"
+_DIST_RE = re.compile(r'(\d+)m')
+
+# Trap number prefixed to the runner name, e.g. "1. Some Dog"
+_TRAP_RE = re.compile(r'^(\d+)\.\s*(.+)$')
+
+# Venue name -> filename-safe form
+_VENUE_FILENAME_TABLE = str.maketrans(' /', '__')
+
+# features_df column -> prediction log field, in log order
+PREDICTION_LOG_COLUMNS = {
+    'market_id': 'market_id',
+    'runner_id': 'selection_id',
+    'runner_name': 'runner_name',
+    'runner_box': 'trap',
+    'runner_odds': 'odds',
+    'win_probability': 'win_probability',
+    'win_probability_raw': 'win_probability_raw'
+}
+
+# Prediction log fields that are constant within a race: stored as categoricals
+# so each race's frame holds one copy of each value instead of one per runner
+PREDICTION_LOG_DTYPES = {
+    'market_id': 'category',
+    'venue': 'category',
+    'race_time': 'category',
+    'race_grade': 'category',
+    'system': 'category',
+    'prediction_time': 'category'
+}
+
 
 class GBBettingSystem:
     """
     Complete betting system for GB Track Specialist strategy.
     """
     
+    # Max markets per listMarketCatalogue call with RUNNER_METADATA (data weight limit)
+    RACE_DATA_BATCH_SIZE = 25
+    
+    # Indent individual race log files (readable, but larger and slower to write)
+    PRETTY_RACE_LOGS = False
+    
+    # Write a full log file for races without a bet too (debugging); otherwise
+    # they get a one-line summary in the session's no_bets.jsonl
+    FULL_NO_BET_RACE_LOGS = False
+    
+    # Most recent races/bets kept in memory for save_logs; older entries are
+    # in earlier saved files, and get_bet_summary keeps lifetime totals
+    MAX_LOGGED_RACES = 10000
+    MAX_LOGGED_BETS = 10000
+    
     def __init__(self, dry_run: bool = True):
         """
         Initialize GB betting system.
@@ -73,18 +188,30 @@ class GBBettingSystem:
         self.result_check_delay_minutes = 45  # Check results 45min after race
         
         # Initialize comprehensive tracking
-        self.all_races_log = []  # ALL races processed
-        self.all_runners_log = []  # ALL runners from all races
-        self.all_predictions_log = []  # ALL model predictions for ALL runners  **NEW**
-        self.bets_placed_log = []  # ONLY actual bets placed
+        self.all_races_log = deque(maxlen=self.MAX_LOGGED_RACES)  # ALL races processed (most recent)
+        self._runner_log_races = deque(maxlen=self.MAX_LOGGED_RACES)  # ALL runners: (runners, race-level fields) per race
+        self._prediction_frames = deque(maxlen=self.MAX_LOGGED_RACES)  # ALL model predictions, one frame per race
+        self.bets_placed_log = deque(maxlen=self.MAX_LOGGED_BETS)  # ONLY actual bets placed (most recent)
         self.pending_results = {}  # Market_id -> race data for result checking
+        self._pending_heap = []  # (check_time, market_id), earliest first
+        self._pending_cv = threading.Condition()  # Guards pending_results and _pending_heap
+        self.races_by_market = {}  # Market_id -> entry in all_races_log
+        self._state_lock = threading.Lock()  # Guards race/bet/runner/prediction logs shared across threads
+        self.bets_by_market = defaultdict(list)  # Market_id -> entries in bets_placed_log
+        self._bet_stats = {'bets': 0, 'stake': 0.0, 'won': 0, 'lost': 0, 'profit': 0.0}  # Running totals over all bets placed
+        self._races_logged = 0  # Lifetime count; all_races_log only keeps the most recent
         
         # Session tracking
         self.session_start = datetime.now()
         self.session_id = self.session_start.strftime("%Y%m%d_%H%M%S")
         self.session_dir = Path("logs") / self.system_name / f"session_{self.session_id}"
         self.session_dir.mkdir(parents=True, exist_ok=True)
-        self.race_logs = {}  # market_id -> race log data
+        
+        # Race log files are written by a background thread
+        self._log_write_queue = queue.Queue()
+        self._no_bet_log = open(self.session_dir / 'no_bets.jsonl', 'ab')
+        self._log_writer_thread = threading.Thread(target=self._log_writer_loop, daemon=True)
+        self._log_writer_thread.start()
         
         logger.info(f"✓ GB Track Specialist initialized")
         logger.info(f"  Mode: {'DRY RUN' if self.dry_run else 'LIVE BETTING'}")
@@ -98,32 +225,85 @@ class GBBettingSystem:
     
     def get_race_data(self, market_id: str) -> Optional[Dict]:
         """Fetch complete race data from Betfair."""
+        return self.get_race_data_batch([market_id])[0]
+    
+    def get_race_data_batch(self, market_ids: List[str], max_workers: int = 8) -> List[Optional[Dict]]:
+        """
+        Fetch complete race data for several markets.
+        
+        Each chunk of RACE_DATA_BATCH_SIZE markets costs one HTTP round-trip:
+        its listMarketCatalogue and listMarketBook calls travel together.
+        Chunks are fetched concurrently over the client's pooled session.
+        
+        Args:
+            market_ids: Market IDs to fetch
+            max_workers: Maximum number of concurrent requests
+            
+        Returns:
+            Race data in the same order as market_ids (None where unavailable)
+        """
+        chunks = [
+            market_ids[i:i + self.RACE_DATA_BATCH_SIZE]
+            for i in range(0, len(market_ids), self.RACE_DATA_BATCH_SIZE)
+        ]
+        
+        if not chunks:
+            return []
+        
+        if len(chunks) == 1:
+            return self._fetch_race_data_chunk(chunks[0])
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            chunk_results = list(executor.map(self._fetch_race_data_chunk, chunks))
+        
+        return [race_data for chunk_result in chunk_results for race_data in chunk_result]
+    
+    def _fetch_race_data_chunk(self, chunk: List[str]) -> List[Optional[Dict]]:
+        """Fetch race data for at most RACE_DATA_BATCH_SIZE markets in one request."""
         try:
-            # Get market catalogue
-            market_catalogue = self.betfair_client._make_api_request(
+            # Get market catalogues and current prices in one batched request
+            market_catalogue, market_book = self.betfair_client._make_api_batch(
                 self.betfair_client.BETTING_URL,
-                'SportsAPING/v1.0/listMarketCatalogue',
-                params={
-                    'filter': {'marketIds': [market_id]},
-                    'maxResults': 1,
-                    'marketProjection': [
-                        'COMPETITION', 'EVENT', 'EVENT_TYPE',
-                        'MARKET_START_TIME', 'RUNNER_DESCRIPTION', 'RUNNER_METADATA'
-                    ]
-                }
+                [
+                    ('SportsAPING/v1.0/listMarketCatalogue', {
+                        'filter': {'marketIds': chunk},
+                        'maxResults': len(chunk),
+                        'marketProjection': [
+                            'COMPETITION', 'EVENT', 'EVENT_TYPE',
+                            'MARKET_START_TIME', 'RUNNER_DESCRIPTION', 'RUNNER_METADATA'
+                        ]
+                    }),
+                    ('SportsAPING/v1.0/listMarketBook', {
+                        'marketIds': chunk,
+                        'priceProjection': self.betfair_client.MARKET_BOOK_PRICE_PROJECTION
+                    })
+                ]
             )
+        except Exception as e:
+            logger.error(f"Error fetching race data: {str(e)}")
+            return [None] * len(chunk)
+        
+        # Responses are not guaranteed to follow request order
+        market_by_id = {m['marketId']: m for m in market_catalogue or []}
+        prices_by_id = {b['marketId']: b for b in market_book or []}
+        
+        race_data_list = []
+        for market_id in chunk:
+            market = market_by_id.get(market_id)
+            prices = prices_by_id.get(market_id)
             
-            if not market_catalogue:
-                return None
-            
-            market = market_catalogue[0]
+            if not market or not prices:
+                race_data_list.append(None)
+                continue
             
-            # Get current prices
-            market_book = self.betfair_client.get_market_book([market_id])
-            if not market_book:
-                return None
-            
-            prices = market_book[0]
+            race_data_list.append(self._build_race_data(market_id, market, prices))
+        
+        return race_data_list
+    
+    def _build_race_data(self, market_id: str, market: Dict, prices: Dict) -> Optional[Dict]:
+        """Build race data from a market catalogue entry and its market book."""
+        try:
+            price_by_id = {r['selectionId']: r for r in prices.get('runners', [])}
             
             # Extract race data
             race_data = {
@@ -138,8 +318,12 @@ class GBBettingSystem:
                 'runners': []
             }
             
+            # Parse race time and clean venue once for scheduling and log filenames
+            race_data['race_time_dt'] = datetime.fromisoformat(race_data['race_time'].replace('Z', '+00:00'))
+            race_data['venue_clean'] = race_data['venue'].translate(_VENUE_FILENAME_TABLE)
+            
             # Extract distance
-            distance_match = re.search(r'(\d+)m', race_data['market_name'])
+            distance_match = _DIST_RE.search(race_data['market_name'])
             race_data['distance'] = int(distance_match.group(1)) if distance_match else 450
             
             # Extract grade (comprehensive UK/Irish patterns)
@@ -147,14 +331,17 @@ class GBBettingSystem:
                 race_data['market_name'], race_data['event_name']
             )
             
-            # Extract ALL runner data
-            for catalogue_runner in market.get('runners', []):
+            # Extract ALL runner data, also as typed per-column arrays for the
+            # predictor (trap/ltp NaN = unknown trap / no back price)
+            catalogue_runners = market.get('runners', [])
+            selection_ids = np.empty(len(catalogue_runners), dtype=np.int64)
+            traps = np.empty(len(catalogue_runners), dtype=np.float64)
+            ltps = np.empty(len(catalogue_runners), dtype=np.float64)
+            
+            for catalogue_runner in catalogue_runners:
                 selection_id = catalogue_runner['selectionId']
                 
-                price_runner = next(
-                    (r for r in prices['runners'] if r['selectionId'] == selection_id),
-                    None
-                )
+                price_runner = price_by_id.get(selection_id)
                 
                 if price_runner:
                     back_prices = price_runner.get('ex', {}).get('availableToBack', [])
@@ -168,7 +355,7 @@ class GBBettingSystem:
                     
                     # If no trap in metadata, extract from runner name
                     if trap is None:
-                        name_match = re.match(r'^(\d+)\.\s*(.+)$', runner_name)
+                        name_match = _TRAP_RE.match(runner_name)
                         if name_match:
                             trap = int(name_match.group(1))
                             runner_name = name_match.group(2)
@@ -182,77 +369,84 @@ class GBBettingSystem:
                         'market_id': market_id
                     }
                     
+                    i = len(race_data['runners'])
+                    selection_ids[i] = selection_id
+                    traps[i] = runner_data['trap'] if runner_data['trap'] is not None else np.nan
+                    ltps[i] = best_back if best_back is not None else np.nan
+                    
                     race_data['runners'].append(runner_data)
             
+            num_runners = len(race_data['runners'])
+            race_data['selection_id_arr'] = selection_ids[:num_runners]
+            race_data['trap_arr'] = traps[:num_runners]
+            race_data['ltp_arr'] = ltps[:num_runners]
+            
             return race_data
             
         except Exception as e:
-            logger.error(f"Error fetching race data: {str(e)}")
+            logger.error(f"Error building race data for {market_id}: {str(e)}")
             return None
     
     def _extract_race_grade(self, market_name: str, event_name: str) -> str:
         """Extract race grade from market or event name."""
-        # Comprehensive grade patterns for UK/Irish greyhounds
-        grade_patterns = [
-            # Australian/NZ grades
-            (r'Gr(\d+/\d+)', lambda m: f"Gr{m.group(1)}"),
-            (r'Gr\s*(\d+)', lambda m: f"Grade{m.group(1)}"),
-            (r'Grade\s*(\d+/\d+)', lambda m: f"Gr{m.group(1)}"),
-            (r'Grade\s*(\d+)', lambda m: f"Grade{m.group(1)}"),
-            
-            # Maiden/Novice/Heat
-            (r'\b(Mdn|MDN|Maiden)\b', lambda m: 'Mdn'),
-            (r'\b(NVC|Novice|Nvc|Nov)\b', lambda m: 'Novice'),
-            (r'\b(Heat|HT)\b', lambda m: 'Heat'),
-            (r'\b(Juvenile|Juv|JUV)\b', lambda m: 'Juvenile'),
-            
-            # UK/Irish A-grades (A0-A11+)
-            (r'\bA(\d{1,2})\b', lambda m: f"A{m.group(1)}"),
-            
-            # UK/Irish D-grades (D0-D9)
-            (r'\bD(\d)\b', lambda m: f"D{m.group(1)}"),
-            
-            # UK/Irish C-grades (C0-C9)
-            (r'\bC(\d)\b', lambda m: f"C{m.group(1)}"),
-            
-            # UK/Irish G-grades (G5-G7)
-            (r'\bG([567])\b', lambda m: f"G{m.group(1)}"),
-            
-            # UK/Irish M-grades (M0-M9)
-            (r'\bM(\d)\b', lambda m: f"M{m.group(1)}"),
-            
-            # UK/Irish P-grades (P0-P9)
-            (r'\bP(\d)\b', lambda m: f"P{m.group(1)}"),
-            
-            # Open Race / Restricted / Handicap
-            (r'\b(OR\d*)\b', lambda m: f"{m.group(1)}"),
-            (r'\b(HC)\b', lambda m: 'HC'),
-            (r'\b(Rest|Restricted|RST)\b', lambda m: 'Rest'),
-        ]
+        # Check market_name first, then event_name
+        for text in (market_name, event_name):
+            # One pass over the text; the highest-priority pattern found wins
+            best = None
+            for grade_match in _GRADE_REGEX.finditer(text):
+                group = _GRADE_GROUPS[grade_match.lastgroup]
+                if best is None or group[0] < best[0][0]:
+                    best = (group, grade_match)
+            
+            if best:
+                (_, grade, is_constant, capture_index), grade_match = best
+                return grade if is_constant else grade.format(grade_match.group(capture_index))
         
-        # Check market_name first
-        for pattern, extractor in grade_patterns:
-            grade_match = re.search(pattern, market_name, re.IGNORECASE)
-            if grade_match:
-                return extractor(grade_match)
+        return 'Unknown'
+    
+    def process_races(self, market_ids: List[str], race_data_list: List[Optional[Dict]]) -> List[Dict]:
+        """
+        Process several fetched races, predicting them all in one batch.
         
-        # If not found in market_name, check event_name
-        for pattern, extractor in grade_patterns:
-            grade_match = re.search(pattern, event_name, re.IGNORECASE)
-            if grade_match:
-                return extractor(grade_match)
+        Args:
+            market_ids: Betfair market IDs
+            race_data_list: Race data per market from get_race_data_batch
+            
+        Returns:
+            process_race result per market
+        """
+        fetched = [race_data for race_data in race_data_list if race_data]
+        artifacts = self.predictor.identify_betting_opportunities_batch(fetched) if fetched else []
+        artifacts_by_market = {
+            race_data['market_id']: race_artifacts
+            for race_data, race_artifacts in zip(fetched, artifacts)
+        }
         
-        return 'Unknown'
+        return [
+            self.process_race(market_id, race_data, artifacts_by_market.get(market_id))
+            for market_id, race_data in zip(market_ids, race_data_list)
+        ]
     
-    def process_race(self, market_id: str) -> Dict:
-        """Process a single race with comprehensive logging."""
+    def process_race(self, market_id: str, race_data: Optional[Dict] = None,
+                     prediction_artifacts: Optional[Tuple] = None) -> Dict:
+        """
+        Process a single race with comprehensive logging.
+        
+        Args:
+            market_id: Betfair market ID
+            race_data: Race data already fetched with get_race_data_batch
+                (fetched here if not given)
+            prediction_artifacts: The race's (opportunities, prediction results,
+                feature DataFrame) from a batch prediction (predicted here if not given)
+        """
         logger.info(f"\n{'='*70}")
         logger.info(f"[GB TRACK SPECIALIST] PROCESSING RACE")
         logger.info(f"{'='*70}")
         logger.info(f"Market ID: {market_id}")
         
         # Fetch race data
-        race_data = self.get_race_data(market_id)
+        if race_data is None:
+            race_data = self.get_race_data(market_id)
         if not race_data:
             return {'status': 'ERROR', 'message': 'Could not fetch race data'}
         
@@ -269,78 +463,62 @@ class GBBettingSystem:
             'system': self.system_name,
             'session_id': self.session_id
         }
-        self.all_races_log.append(race_log_entry)
+        with self._state_lock:
+            if len(self.all_races_log) == self.all_races_log.maxlen:
+                oldest = self.all_races_log[0]
+                if self.races_by_market.get(oldest['market_id']) is oldest:
+                    del self.races_by_market[oldest['market_id']]
+            self.all_races_log.append(race_log_entry)
+            self.races_by_market[market_id] = race_log_entry
+            self._races_logged += 1
         
-        # Log all runners
-        for runner in race_data['runners']:
-            runner_log = {
-                **runner,
-                'venue': race_data['venue'],
-                'race_time': race_data['race_time'],
-                'system': self.system_name,
-                'logged_time': datetime.now().isoformat()
-            }
-            self.all_runners_log.append(runner_log)
-        
-        # DATABASE: Log race to database
-        race_id = self.db.log_race(
-            market_id=race_data['market_id'],
-            venue=race_data['venue'],
-            race_time=race_data['race_time'],
-            distance=race_data.get('distance'),
-            race_grade=race_data.get('race_grade'),
-            num_runners=len(race_data['runners']),
-            session_id=self.session_id
-        )
+        # Log all runners (shares the runner dicts; flattened in save_logs)
+        race_fields = {
+            'venue': race_data['venue'],
+            'race_time': race_data['race_time'],
+            'system': self.system_name,
+            'logged_time': datetime.now().isoformat()
+        }
+        with self._state_lock:
+            self._runner_log_races.append((race_data['runners'], race_fields))
         
-        # Get betting opportunities (this also generates predictions for ALL runners)
-        opportunities = self.predictor.identify_betting_opportunities(race_data)
+        # DATABASE: Queue race for the database writer
+        self.db.log_race({**race_data, 'session_id': self.session_id, 'system': self.system_name})
         
-        # **NEW: Get complete feature DataFrame and log ALL model predictions to DATABASE**
-        prediction_results = self.predictor.predictor.predict_race(race_data)
-        features_df = self.predictor.predictor.engineer_track_specialist_features(race_data)
+        # Get betting opportunities along with the predictions for ALL runners
+        # and the complete feature DataFrame they were made from
+        if prediction_artifacts is None:
+            prediction_artifacts = self.predictor.identify_betting_opportunities_with_artifacts(race_data)
+        opportunities, prediction_results, features_df = prediction_artifacts
         
         if features_df is not None:
             # Add race_time column for database
             features_df['race_time'] = race_data['race_time']
             features_df['market_id'] = race_data['market_id']
             
-            # Merge with prediction results to get win probabilities
-            for idx, row in features_df.iterrows():
-                runner_id = row['runner_id']
-                # Find matching prediction
-                matching_pred = next(
-                    (p for p in prediction_results['predictions'] if p['selection_id'] == runner_id),
-                    None
-                )
-                if matching_pred:
-                    win_prob = matching_pred['win_probability']
-                    features_df.at[idx, 'win_probability'] = win_prob.get('calibrated', win_prob) if isinstance(win_prob, dict) else win_prob
-                    features_df.at[idx, 'win_probability_raw'] = win_prob.get('base') if isinstance(win_prob, dict) else None
+            # Win probabilities: the predictions were made from these same rows
+            if 'calibrated_prob' in features_df.columns:
+                features_df['win_probability'] = features_df['calibrated_prob']
+                features_df['win_probability_raw'] = features_df['base_prob']
             
             # DATABASE: Log all predictions with complete features
             self.db.log_predictions(features_df, self.session_id)
         
         # Log predictions to in-memory logs as well
-        for runner_pred in prediction_results.get('predictions', []):
-            win_prob = runner_pred.get('win_probability', {})
-            prediction_log = {
-                'market_id': race_data['market_id'],
-                'selection_id': runner_pred['selection_id'],
-                'runner_name': runner_pred['runner_name'],
-                'trap': runner_pred['trap'],
-                'odds': runner_pred['ltp'],
-                'win_probability': win_prob.get('calibrated', win_prob) if isinstance(win_prob, dict) else win_prob,
-                'win_probability_raw': win_prob.get('base') if isinstance(win_prob, dict) else None,
-                'venue': race_data['venue'],
-                'race_time': race_data['race_time'],
-                'distance': race_data.get('distance'),
-                'race_grade': race_data.get('race_grade'),
-                'num_runners': len(race_data['runners']),
-                'system': self.system_name,
-                'prediction_time': datetime.now().isoformat()
-            }
-            self.all_predictions_log.append(prediction_log)
+        if features_df is not None and prediction_results.get('predictions'):
+            prediction_log_df = features_df[list(PREDICTION_LOG_COLUMNS)].rename(columns=PREDICTION_LOG_COLUMNS)
+            prediction_log_df = prediction_log_df.assign(
+                venue=race_data['venue'],
+                race_time=race_data['race_time'],
+                distance=race_data.get('distance'),
+                race_grade=race_data.get('race_grade'),
+                num_runners=len(race_data['runners']),
+                system=self.system_name,
+                prediction_time=datetime.now().isoformat()
+            )
+            prediction_log_df = prediction_log_df.astype(PREDICTION_LOG_DTYPES)
+            with self._state_lock:
+                self._prediction_frames.append(prediction_log_df)
         
         result = {
             'market_id': market_id,
@@ -355,33 +533,43 @@ class GBBettingSystem:
         bets_placed = []
         for opp in opportunities:
             bet_result = self.place_bet(opp)
-            self.bets_placed_log.append(bet_result)
+            with self._state_lock:
+                if len(self.bets_placed_log) == self.bets_placed_log.maxlen:
+                    self._forget_bet(self.bets_placed_log[0])
+                self.bets_placed_log.append(bet_result)
+                self._bet_stats['bets'] += 1
+                self._bet_stats['stake'] += bet_result.get('stake', 0)
+                if bet_result.get('status') != 'ERROR':
+                    self.bets_by_market[market_id].append(bet_result)
             result['bets_placed'].append(bet_result)
             bets_placed.append(bet_result)
             
-            # DATABASE: Log bet to database
+            # DATABASE: Queue bet for the database writer
             if bet_result.get('status') not in ['ERROR']:
-                self.db.log_bet(
-                    market_id=bet_result['market_id'],
-                    selection_id=bet_result['selection_id'],
-                    runner_name=bet_result['runner_name'],
-                    odds=bet_result['runner_odds'],
-                    stake=bet_result['stake'],
-                    strategy=bet_result.get('strategy'),
-                    win_probability=bet_result.get('win_probability'),
-                    session_id=self.session_id
-                )
+                self.db.log_bet({
+                    **bet_result,
+                    'trap': int(opp['trap']) if opp.get('trap') is not None else None,
+                    'venue': race_data['venue'],
+                    'race_time': race_data['race_time'],
+                    'race_grade': race_data.get('race_grade'),
+                    'distance': race_data.get('distance'),
+                    'session_id': self.session_id,
+                    'dry_run': self.dry_run
+                })
         
         # Create individual race log
         self._create_individual_race_log(race_data, opportunities, bets_placed)
         
         # Add to pending results for later checking
-        self.pending_results[market_id] = {
-            'race_data': race_data,
-            'opportunities': opportunities,
-            'check_time': datetime.fromisoformat(race_data['race_time'].replace('Z', '+00:00')) + 
-                         timedelta(minutes=self.result_check_delay_minutes)
-        }
+        with self._pending_cv:
+            self.pending_results[market_id] = {
+                'race_data': race_data,
+                'opportunities': opportunities,
+                'check_time': race_data['race_time_dt'] + 
+                             timedelta(minutes=self.result_check_delay_minutes)
+            }
+            heapq.heappush(self._pending_heap, (self.pending_results[market_id]['check_time'], market_id))
+            self._pending_cv.notify()
         
         # Terminal feedback
         if opportunities:
@@ -442,6 +630,9 @@ class GBBettingSystem:
                     }
                 )
                 
+                # Keep only the fields we need from the response, not the raw blob
+                instruction_reports = result.get('instructionReports') or [{}]
+                
                 bet_result = {
                     'market_id': opportunity['market_id'],
                     'selection_id': opportunity['selection_id'],
@@ -449,14 +640,14 @@ class GBBettingSystem:
                     'runner_odds': opportunity['runner_odds'],
                     'stake': stake,
                     'status': result.get('status', 'UNKNOWN'),
-                    'bet_id': result.get('betId', 'UNKNOWN'),
+                    'instruction_status': instruction_reports[0].get('status'),
+                    'bet_id': instruction_reports[0].get('betId') or result.get('betId', 'UNKNOWN'),
                     'placed_time': datetime.now().isoformat(),
                     'system': self.system_name,
                     'strategy': opportunity['strategy'],
                     'strategy_subtype': opportunity['strategy_subtype'],
                     'win_probability': opportunity['win_probability'],
-                    'expected_value': opportunity['expected_value'],
-                    'api_response': result
+                    'expected_value': opportunity['expected_value']
                 }
                 
                 if result.get('status') == 'SUCCESS':
@@ -508,23 +699,25 @@ class GBBettingSystem:
             'race_result': None  # Will be updated later
         }
         
-        # Store in memory
-        self.race_logs[market_id] = race_log
-        
         # Save to file
         self._save_individual_race_log(race_data, race_log, has_bet=len(bets_placed) > 0)
     
     def _save_individual_race_log(self, race_data: Dict, race_log: Dict, has_bet: bool = False):
         """Save individual race log to file."""
-        # Clean venue name for filename
-        venue_clean = race_data['venue'].replace(' ', '_').replace('/', '_')
-        
-        # Parse race time for filename
-        race_time = datetime.fromisoformat(race_data['race_time'].replace('Z', '+00:00'))
-        time_str = race_time.strftime('%H%M')
+        # Races without a bet are only summarized, all in one file
+        if not has_bet and not self.FULL_NO_BET_RACE_LOGS:
+            summary = {
+                **race_log['race_info'],
+                'session_id': race_log['session_id'],
+                'opportunities_identified': race_log['betting_logic']['opportunities_identified'],
+                'betting_decision': race_log['betting_logic']['betting_decision']
+            }
+            self._log_write_queue.put((None, summary))
+            return
         
-        # Build filename
-        filename = f"gb_race_{venue_clean}_{time_str}_{race_data['market_id']}"
+        # Build filename from the venue and race time cleaned/parsed at fetch
+        time_str = race_data['race_time_dt'].strftime('%H%M')
+        filename = f"gb_race_{race_data['venue_clean']}_{time_str}_{race_data['market_id']}"
         
         if has_bet:
             filename += "_BET"
@@ -536,37 +729,87 @@ class GBBettingSystem:
         
         filepath = self.session_dir / filename
         
-        with open(filepath, 'w') as f:
-            json.dump(race_log, f, indent=2)
+        self._log_write_queue.put((filepath, race_log))
     
-    def _result_checker_loop(self):
-        """Background thread to check race results."""
-        while self.result_checker_running:
+    def _log_writer_loop(self):
+        """Background thread to write queued race log files."""
+        while True:
+            item = self._log_write_queue.get()
             try:
-                now = datetime.now(timezone.utc)
+                if item is None:
+                    return
                 
-                # Check for races that need result checking
-                markets_to_check = [
-                    market_id for market_id, data in self.pending_results.items()
-                    if data['check_time'] <= now
-                ]
+                filepath, race_log = item
+                
+                if filepath is None:
+                    self._no_bet_log.write(orjson.dumps(race_log, option=orjson.OPT_APPEND_NEWLINE))
+                    self._no_bet_log.flush()
+                    continue
                 
-                for market_id in markets_to_check:
-                    self._check_race_result(market_id)
-                    del self.pending_results[market_id]
+                option = orjson.OPT_SERIALIZE_NUMPY
+                if self.PRETTY_RACE_LOGS:
+                    option |= orjson.OPT_INDENT_2
                 
-                time.sleep(60)
+                with self._state_lock:
+                    content = orjson.dumps(race_log, option=option)
+                filepath.write_bytes(content)
+            except Exception as e:
+                logger.error(f"Error writing race log {item[0] or 'no_bets.jsonl'}: {str(e)}")
+            finally:
+                self._log_write_queue.task_done()
+    
+    def _result_checker_loop(self):
+        """Background thread to check race results, sleeping until the next one is due."""
+        while True:
+            with self._pending_cv:
+                while self.result_checker_running:
+                    now = datetime.now(timezone.utc)
+                    if self._pending_heap and self._pending_heap[0][0] <= now:
+                        break
+                    
+                    timeout = (self._pending_heap[0][0] - now).total_seconds() if self._pending_heap else None
+                    self._pending_cv.wait(timeout)
+                
+                if not self.result_checker_running:
+                    return
                 
+                # Pop every race that is due (a re-processed market is only checked once)
+                markets_to_check = []
+                while self._pending_heap and self._pending_heap[0][0] <= now:
+                    _, market_id = heapq.heappop(self._pending_heap)
+                    if self.pending_results.pop(market_id, None) is not None:
+                        markets_to_check.append(market_id)
+            
+            # One listMarketBook call per chunk of due markets
+            try:
+                books_by_id = {
+                    book['marketId']: book
+                    for book in self.betfair_client.get_market_books(markets_to_check)
+                }
             except Exception as e:
                 logger.error(f"Error in result checker: {str(e)}")
-                time.sleep(60)
+                books_by_id = {}
+            
+            for market_id in markets_to_check:
+                try:
+                    self._check_race_result(market_id, books_by_id.get(market_id))
+                except Exception as e:
+                    logger.error(f"Error in result checker: {str(e)}")
     
-    def _check_race_result(self, market_id: str):
-        """Check the result of a completed race."""
+    def _check_race_result(self, market_id: str, market_book: Optional[Dict] = None):
+        """
+        Check the result of a completed race.
+        
+        Args:
+            market_id: Betfair market ID
+            market_book: The market's book if already fetched (fetched here if not given)
+        """
         try:
             logger.info(f"[GB TRACK SPECIALIST] Checking result for market {market_id}")
             
-            market_book = self.betfair_client.get_market_book([market_id])
+            if market_book is None:
+                market_books = self.betfair_client.get_market_book([market_id])
+                market_book = market_books[0] if market_books else None
             
             if not market_book:
                 logger.warning(f"Could not get result for {market_id}")
@@ -574,31 +817,37 @@ class GBBettingSystem:
             
             # Find winner
             winner_id = None
-            for runner in market_book[0].get('runners', []):
+            for runner in market_book.get('runners', []):
                 if runner.get('status') == 'WINNER':
                     winner_id = runner['selectionId']
                     break
             
-            # DATABASE: Update race result in database
-            if winner_id:
-                self.db.update_race_result(market_id, winner_id)
-            
             # Update logs with result
-            for race in self.all_races_log:
-                if race['market_id'] == market_id:
+            with self._state_lock:
+                race = self.races_by_market.get(market_id)
+                winner = None
+                if race is not None:
                     race['winner_selection_id'] = winner_id
                     race['result_checked_time'] = datetime.now().isoformat()
                     
-                    for runner in race['runners']:
-                        if runner['selection_id'] == winner_id:
-                            race['winner_name'] = runner['runner_name']
-                            race['winner_odds'] = runner['ltp']
-                            logger.info(f"[GB] Winner: {runner['runner_name']} @ {runner['ltp']:.2f}")
-                            break
+                    winner = next((r for r in race['runners'] if r['selection_id'] == winner_id), None)
+                    if winner:
+                        race['winner_name'] = winner['runner_name']
+                        race['winner_odds'] = winner['ltp']
+                        logger.info(f"[GB] Winner: {winner['runner_name']} @ {winner['ltp']:.2f}")
+            
+            # DATABASE: Update race result in database
+            if winner_id:
+                self.db.update_race_result(market_id, {
+                    'selection_id': winner_id,
+                    'runner_name': winner['runner_name'] if winner else None,
+                    'odds': winner['ltp'] if winner else None
+                })
             
             # Update bet logs with result
-            for bet in self.bets_placed_log:
-                if bet['market_id'] == market_id:
+            with self._state_lock:
+                for bet in self.bets_by_market.get(market_id, []):
+                    already_settled = 'won' in bet
                     bet['winner_selection_id'] = winner_id
                     bet['won'] = (bet['selection_id'] == winner_id)
                     bet['result_checked_time'] = datetime.now().isoformat()
@@ -611,60 +860,144 @@ class GBBettingSystem:
                         bet['returns'] = 0
                         bet['profit'] = -bet['stake']
                         logger.info(f"[GB] ✗ BET LOST: {bet['runner_name']}")
+                    
+                    if not already_settled:
+                        self._bet_stats['won' if bet['won'] else 'lost'] += 1
+                        self._bet_stats['profit'] += bet['profit']
                         
         except Exception as e:
             logger.error(f"Error checking result for {market_id}: {str(e)}")
     
+    def _forget_bet(self, bet: Dict):
+        """Drop a bet about to leave bets_placed_log from bets_by_market (call under _state_lock)."""
+        market_bets = self.bets_by_market.get(bet.get('market_id'))
+        if market_bets is None:
+            return  # e.g. an ERROR bet, which is never indexed
+        market_bets[:] = [b for b in market_bets if b is not bet]
+        if not market_bets:
+            del self.bets_by_market[bet['market_id']]
+    
+    def get_bet_summary(self) -> Dict:
+        """
+        Get running totals over all bets placed this session.
+        
+        Kept up to date as bets are placed and settled, so this does not
+        scan bets_placed_log.
+        
+        Returns:
+            Dict with bets, stake, won, lost, pending, profit (settled bets only)
+            and races (races logged)
+        """
+        with self._state_lock:
+            summary = dict(self._bet_stats)
+            summary['races'] = self._races_logged
+        summary['pending'] = summary['bets'] - summary['won'] - summary['lost']
+        return summary
+    
     def save_logs(self, output_dir: str = "logs"):
         """Save comprehensive logs."""
+        self.write_logs(self.snapshot_logs(), output_dir)
+    
+    def snapshot_logs(self) -> Dict:
+        """
+        Snapshot the logs other threads append to and update.
+        
+        Cheap enough to take on a busy thread; write_logs can then run
+        anywhere without touching live state.
+        
+        Returns:
+            Snapshot to pass to write_logs
+        """
+        with self._state_lock:
+            return {
+                'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"),
+                'num_races': len(self.all_races_log),
+                'races_json': orjson.dumps(list(self.all_races_log), option=LOG_DUMP_OPTIONS),
+                'num_bets': len(self.bets_placed_log),
+                'bets_json': orjson.dumps(list(self.bets_placed_log), option=LOG_DUMP_OPTIONS),
+                'bets_df': pd.DataFrame(list(self.bets_placed_log)),
+                'runner_log_races': list(self._runner_log_races),
+                'prediction_frames': list(self._prediction_frames)
+            }
+    
+    def write_logs(self, snapshot: Dict, output_dir: str = "logs"):
+        """
+        Write a log snapshot to files.
+        
+        Args:
+            snapshot: Logs from snapshot_logs
+            output_dir: Base directory for the log files
+        """
         output_path = Path(output_dir) / self.system_name
         output_path.mkdir(parents=True, exist_ok=True)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = snapshot['timestamp']
+        num_races = snapshot['num_races']
+        races_json = snapshot['races_json']
+        num_bets = snapshot['num_bets']
+        bets_json = snapshot['bets_json']
+        bets_df = snapshot['bets_df']
+        runner_log_races = snapshot['runner_log_races']
+        prediction_frames = snapshot['prediction_frames']
         
         # 1. ALL RACES LOG
-        if self.all_races_log:
+        if num_races:
             races_file = output_path / f"gb_all_races_{timestamp}.json"
-            with open(races_file, 'w') as f:
-                json.dump(self.all_races_log, f, indent=2)
-            logger.info(f"[GB] Saved {len(self.all_races_log)} races to {races_file}")
+            races_file.write_bytes(races_json)
+            logger.info(f"[GB] Saved {num_races} races to {races_file}")
         
         # 2. ALL RUNNERS LOG
-        if self.all_runners_log:
+        runners_log = [
+            {**runner, **race_fields}
+            for runners, race_fields in runner_log_races
+            for runner in runners
+        ]
+        if runners_log:
             runners_file = output_path / f"gb_all_runners_{timestamp}.json"
-            with open(runners_file, 'w') as f:
-                json.dump(self.all_runners_log, f, indent=2)
-            logger.info(f"[GB] Saved {len(self.all_runners_log)} runners to {runners_file}")
+            runners_file.write_bytes(orjson.dumps(runners_log, option=LOG_DUMP_OPTIONS))
+            logger.info(f"[GB] Saved {len(runners_log)} runners to {runners_file}")
         
         # 3. ALL PREDICTIONS LOG **NEW**
-        if self.all_predictions_log:
+        if prediction_frames:
+            df = pd.concat(prediction_frames, ignore_index=True)
+            
             predictions_file = output_path / f"gb_predictions_{timestamp}.json"
-            with open(predictions_file, 'w') as f:
-                json.dump(self.all_predictions_log, f, indent=2)
-            logger.info(f"[GB] Saved {len(self.all_predictions_log)} predictions to {predictions_file}")
+            predictions_file.write_bytes(orjson.dumps(df.to_dict('records'), option=LOG_DUMP_OPTIONS))
+            logger.info(f"[GB] Saved {len(df)} predictions to {predictions_file}")
             
             # Also save as CSV for easy analysis
             predictions_csv = output_path / f"gb_predictions_{timestamp}.csv"
-            df = pd.DataFrame(self.all_predictions_log)
             df.to_csv(predictions_csv, index=False)
             logger.info(f"[GB] Saved predictions CSV to {predictions_csv}")
         
         # 4. BETS PLACED LOG
-        if self.bets_placed_log:
+        if num_bets:
             bets_file = output_path / f"gb_bets_placed_{timestamp}.json"
-            with open(bets_file, 'w') as f:
-                json.dump(self.bets_placed_log, f, indent=2)
-            logger.info(f"[GB] Saved {len(self.bets_placed_log)} bets to {bets_file}")
+            bets_file.write_bytes(bets_json)
+            logger.info(f"[GB] Saved {num_bets} bets to {bets_file}")
             
             # Also save as CSV
             bets_csv = output_path / f"gb_bets_placed_{timestamp}.csv"
-            df = pd.DataFrame(self.bets_placed_log)
-            df.to_csv(bets_csv, index=False)
+            bets_df.to_csv(bets_csv, index=False)
             logger.info(f"[GB] Saved bets CSV to {bets_csv}")
     
     def cleanup(self):
         """Cleanup resources."""
-        self.result_checker_running = False
+        with self._pending_cv:
+            self.result_checker_running = False
+            self._pending_cv.notify()
+        # Let an in-flight result check queue its write before the database flush
+        self.result_checker_thread.join(timeout=30)
+        
+        # Finish writing queued race logs
+        self._log_write_queue.put(None)
+        self._log_writer_thread.join()
+        self._no_bet_log.close()
+        
+        # Flush the write-behind queue (races, predictions, bets, results)
+        if self.db and self.db.connected:
+            self.db.cleanup()
+        
         if self.betfair_client:
             self.betfair_client.logout()
             logger.info("[GB TRACK SPECIALIST] Logged out from Betfair")
@@ -707,9 +1040,25 @@ if __name__ == "__main__":
         if races:
             logger.info(f"Found {len(races)} upcoming GB races\n")
             
-            for race in races:
-                system.process_race(race['market_id'])
-                time.sleep(0.5)
+            market_ids = [race['market_id'] for race in races]
+            
+            chunks = [
+                market_ids[i:i + system.RACE_DATA_BATCH_SIZE]
+                for i in range(0, len(market_ids), system.RACE_DATA_BATCH_SIZE)
+            ]
+            
+            # Fetch a batch at a time so prices stay fresh while it is processed;
+            # the next batch downloads in the background while this one is
+            # processed on the main thread
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                pending = prefetcher.submit(system.get_race_data_batch, chunks[0])
+                
+                for i, chunk in enumerate(chunks):
+                    race_data_list = pending.result()
+                    if i + 1 < len(chunks):
+                        pending = prefetcher.submit(system.get_race_data_batch, chunks[i + 1])
+                    
+                    system.process_races(chunk, race_data_list)
         
         # Save logs
         system.save_logs()
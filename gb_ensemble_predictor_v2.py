@@ -12,15 +12,17 @@ import numpy as np
 from pathlib import Path
 import sys
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from collections import OrderedDict
 import json
 
 # Add paths
 sys.path.append(str(Path(__file__).parent.parent.parent))
 sys.path.append(str(Path(__file__).parent.parent))
 
-from catboost import CatBoostRegressor, CatBoostClassifier
+from catboost import CatBoostRegressor, CatBoostClassifier, Pool
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +30,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Box position score indexed by trap (clipped); traps outside 1-6 score 0.7
+BOX_POSITION_SCORES = np.array([0.7, 1.0, 0.95, 0.9, 0.85, 0.8, 0.75, 0.7])
+
+
+def _positive_ratio(numerator, denominator) -> np.ndarray:
+    """Divide only where the denominator is positive; NaN elsewhere."""
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    return np.divide(numerator, denominator, out=out, where=np.greater(denominator, 0))
+
 
 class GBEnsemblePredictor:
     """
@@ -35,6 +46,9 @@ class GBEnsemblePredictor:
     Matches ALL 32 features required by trained Track Specialist Model.
     """
     
+    # Races whose predictions are kept for reuse when the same inputs repeat
+    PREDICTION_CACHE_SIZE = 512
+    
     def __init__(self):
         """Initialize GB Ensemble predictor with both models."""
         logger.info("Initializing GB Ensemble Predictor V2...")
@@ -55,16 +69,27 @@ class GBEnsemblePredictor:
         logger.info(f"✓ Loaded Track Specialist Model")
         logger.info(f"  Expected features: {len(self.track_model.feature_names_)}")
         
-        # Load Calibrator Model
-        logger.info("Loading Calibrator Model...")
-        calibrator_model_path = self.artifacts_dir / 'calibrator_model.cbm'
+        # Feature names and categorical positions are fixed for a loaded model
+        self.track_features = list(self.track_model.feature_names_)
+        self.track_cat_features = self.track_model.get_cat_feature_indices()
+        
+        # Calibrator Model is loaded on first use (see the calibrator property)
+        self.calibrator_model_path = self.artifacts_dir / 'calibrator_model.cbm'
+        
+        if not self.calibrator_model_path.exists():
+            raise FileNotFoundError(f"Calibrator model not found: {self.calibrator_model_path}")
+        
+        self._calibrator = None
+        self._calibrator_features = None
+        self._calibrator_cat_features = None
+        self._calibrator_lock = threading.Lock()
         
-        if not calibrator_model_path.exists():
-            raise FileNotFoundError(f"Calibrator model not found: {calibrator_model_path}")
+        # Engineered columns are the same for every race, so check them once
+        self._validate_feature_schema(self.track_features)
         
-        self.calibrator = CatBoostClassifier()
-        self.calibrator.load_model(str(calibrator_model_path))
-        logger.info(f"✓ Loaded Calibrator Model")
+        # Race inputs -> (prediction results, feature DataFrame), least recent first
+        self._prediction_cache = OrderedDict()
+        self._prediction_cache_lock = threading.Lock()  # Races may be predicted from timer threads
         
         # Strategy configuration
         self.strategy_config = {
@@ -78,6 +103,87 @@ class GBEnsemblePredictor:
         logger.info(f"  Strategy: Top 15% by predicted profit")
         logger.info(f"  Expected ROI: {self.strategy_config['expected_roi']:.0f}%")
     
+    @property
+    def calibrator(self) -> CatBoostClassifier:
+        """Calibrator Model, loaded from disk the first time it is needed."""
+        if self._calibrator is None:
+            with self._calibrator_lock:
+                if self._calibrator is None:
+                    logger.info("Loading Calibrator Model...")
+                    calibrator = CatBoostClassifier()
+                    calibrator.load_model(str(self.calibrator_model_path))
+                    calibrator_features = list(calibrator.feature_names_)
+                    self._validate_feature_schema(calibrator_features)
+                    self._calibrator_features = calibrator_features
+                    self._calibrator_cat_features = calibrator.get_cat_feature_indices()
+                    self._calibrator = calibrator
+                    logger.info(f"✓ Loaded Calibrator Model")
+        return self._calibrator
+    
+    @property
+    def calibrator_features(self) -> List[str]:
+        """Feature names expected by the Calibrator Model."""
+        self.calibrator  # Loads the model on first access
+        return self._calibrator_features
+    
+    @property
+    def calibrator_cat_features(self) -> List[int]:
+        """Categorical feature positions of the Calibrator Model."""
+        self.calibrator  # Loads the model on first access
+        return self._calibrator_cat_features
+    
+    @staticmethod
+    def _prediction_cache_key(race_data: Dict) -> tuple:
+        """Key a race by every input that feature engineering reads."""
+        return (
+            race_data['market_id'],
+            race_data['venue'],
+            race_data['race_time'],
+            race_data.get('distance'),
+            race_data.get('race_grade'),
+            tuple(
+                (runner['selection_id'], runner['runner_name'], runner.get('trap'), runner.get('ltp'))
+                for runner in race_data['runners']
+            )
+        )
+    
+    def clear_prediction_cache(self):
+        """Forget cached predictions (e.g. after reloading models)."""
+        with self._prediction_cache_lock:
+            self._prediction_cache.clear()
+    
+    def _validate_feature_schema(self, features: List[str]):
+        """
+        Check that engineered features cover a model's inputs.
+        
+        Args:
+            features: Feature names the model expects
+        
+        Raises:
+            ValueError: If a model expects a feature that is not engineered
+        """
+        sample_race = {
+            'market_id': 'SCHEMA_CHECK',
+            'venue': 'Romford',
+            'distance': 400,
+            'race_grade': 'A6',
+            'race_time': '2024-01-15T19:30:00.000Z',
+            'runners': [
+                {'runner_name': 'Check Dog 1', 'selection_id': 1, 'trap': 1, 'ltp': 3.5},
+                {'runner_name': 'Check Dog 2', 'selection_id': 2, 'trap': 2, 'ltp': 5.0}
+            ]
+        }
+        df_sample = self.engineer_track_specialist_features(sample_race)
+        if df_sample is None:
+            raise ValueError("Could not engineer features for schema check")
+        
+        missing_features = [
+            f for f in features
+            if f not in df_sample.columns
+        ]
+        if missing_features:
+            raise ValueError(f"Missing features: {missing_features}")
+    
     def engineer_track_specialist_features(self, race_data: Dict) -> Optional[pd.DataFrame]:
         """
         Engineer ALL 32 features required by Track Specialist Model.
@@ -97,164 +203,299 @@ class GBEnsemblePredictor:
             race_day_of_week = race_time.weekday()
             is_weekend = 1 if race_day_of_week >= 5 else 0
             
-            # Create DataFrame from runners
-            runners = []
-            for runner in race_data['runners']:
-                runners.append({
-                    'runner_id': runner['selection_id'],
-                    'runner_name': runner['runner_name'],
-                    'runner_box': runner.get('trap', 0),
-                    'bsp': runner.get('ltp', 10.0),  # Use LTP as BSP
-                    'market_id': race_data['market_id']
-                })
-            
+            runners = race_data['runners']
             if not runners:
                 return None
             
-            df = pd.DataFrame(runners)
+            # Runner columns as arrays, straight from the typed runner arrays
+            # when the caller built them (see GBBettingSystem.get_race_data)
+            if 'ltp_arr' in race_data:
+                runner_ids = race_data['selection_id_arr']
+                box = race_data['trap_arr']
+                bsp = race_data['ltp_arr']  # Use LTP as BSP
+            else:
+                # Fill typed arrays straight from the runner dicts (trap None = NaN, no price = NaN)
+                runner_ids = np.fromiter((runner['selection_id'] for runner in runners),
+                                         dtype=np.int64, count=len(runners))
+                box = np.fromiter((np.nan if trap is None else trap
+                                   for trap in (runner.get('trap', 0) for runner in runners)),
+                                  dtype=np.float64, count=len(runners))
+                bsp = np.fromiter((np.nan if ltp is None else ltp
+                                   for ltp in (runner.get('ltp', 10.0) for runner in runners)),
+                                  dtype=np.float64, count=len(runners))
             
-            # Add race context
-            df['venue_abbr'] = venue[:4].upper()
-            df['race_category'] = race_grade
-            df['race_grade'] = race_grade  
-            df['distance'] = distance
-            df['race_hour'] = race_hour
-            df['is_weekend'] = is_weekend
+            n = len(bsp)
+            # Race-level aggregations skip missing prices; one sort of the
+            # priced runners gives the min, max, second favorite and ranks
+            sorted_priced = np.sort(bsp[~np.isnan(bsp)])
+            num_priced = len(sorted_priced)
             
             # RACE-LEVEL AGGREGATIONS (required for market features)
-            df['field_size'] = len(df)
-            df['favorite_bsp'] = df['bsp'].min()
-            df['mean_bsp'] = df['bsp'].mean()
-            df['bsp_std'] = df['bsp'].std()
-            
-            # RUNNER ODDS FEATURES
-            df['runner_odds'] = df['bsp']
-            df['runner_implied_prob'] = np.where(df['bsp'] > 0, 1.0 / df['bsp'], np.nan)
-            df['runner_log_odds'] = np.log(df['bsp'].clip(lower=1.01))
-            df['runner_odds_rank'] = df['bsp'].rank(method='min')
+            if num_priced:
+                favorite_bsp = sorted_priced[0]
+                max_bsp = sorted_priced[-1]
+                mean_bsp = sorted_priced.sum() / num_priced
+            else:
+                favorite_bsp = max_bsp = mean_bsp = np.nan
+            if num_priced > 1:
+                deviations = sorted_priced - mean_bsp
+                bsp_std = np.sqrt(deviations.dot(deviations) / (num_priced - 1))
+            else:
+                bsp_std = np.nan
             
-            # ODDS DIFFERENTIALS
-            df['odds_vs_favorite_diff'] = df['bsp'] - df['favorite_bsp']
-            df['odds_vs_favorite_ratio'] = np.where(df['favorite_bsp'] > 0,
-                                                     df['bsp'] / df['favorite_bsp'], np.nan)
-            df['odds_vs_mean_diff'] = df['bsp'] - df['mean_bsp']
-            df['odds_vs_mean_ratio'] = np.where(df['mean_bsp'] > 0,
-                                                 df['bsp'] / df['mean_bsp'], np.nan)
+            # Second favorite (missing prices count as last)
+            if n == 1:
+                second_fav_bsp = favorite_bsp
+            else:
+                second_fav_bsp = sorted_priced[1] if num_priced > 1 else np.nan
             
-            # Second favorite
-            second_fav_bsp = df.sort_values('bsp').iloc[1]['bsp'] if len(df) > 1 else df['bsp'].min()
-            df['second_favorite_bsp'] = second_fav_bsp
-            df['odds_vs_second_diff'] = df['bsp'] - second_fav_bsp
-            df['odds_vs_second_ratio'] = np.where(second_fav_bsp > 0,
-                                                   df['bsp'] / second_fav_bsp, np.nan)
+            # RUNNER ODDS FEATURES
+            runner_implied_prob = _positive_ratio(1.0, bsp)
+            odds_vs_favorite_ratio = _positive_ratio(bsp, favorite_bsp)
+            odds_vs_mean_ratio = _positive_ratio(bsp, mean_bsp)
+            odds_vs_second_ratio = _positive_ratio(bsp, second_fav_bsp)
             
             # MARKET STRUCTURE FEATURES
-            df['market_compression'] = np.where(df['bsp_std'] > 0, df['mean_bsp'] / df['bsp_std'], np.nan)
-            df['favorite_dominance'] = np.where(df['mean_bsp'] > 0,
-                                                 df['favorite_bsp'] / df['mean_bsp'], np.nan)
-            df['odds_std'] = df['bsp_std']
-            df['odds_range'] = df['bsp'].max() - df['bsp'].min()
-            df['odds_cv'] = np.where(df['mean_bsp'] > 0, df['bsp_std'] / df['mean_bsp'], np.nan)
+            market_compression = mean_bsp / bsp_std if bsp_std > 0 else np.nan
+            favorite_dominance = favorite_bsp / mean_bsp if mean_bsp > 0 else np.nan
+            odds_cv = bsp_std / mean_bsp if mean_bsp > 0 else np.nan
+            
+            # Odds rank with ties sharing the lowest rank (pandas method='min');
+            # unpriced runners are not ranked
+            runner_odds_rank = np.searchsorted(sorted_priced, bsp, side='left') + 1.0
+            runner_odds_rank[np.isnan(bsp)] = np.nan
             
             # COMPETITIVE FIELD INDICATORS
-            df['num_competitive'] = (df['bsp'] <= 4.0).sum()
-            df['longshot'] = (df['bsp'] > 10.0).astype(int)
-            df['weak_favorite'] = ((df['runner_odds_rank'] == 1) & (df['bsp'] > 2.5)).astype(int)
-            df['dominant_favorite'] = ((df['runner_odds_rank'] == 1) & (df['bsp'] < 1.8)).astype(int)
-            df['competitive_field'] = (df['num_competitive'] >= 4).astype(int)
+            num_competitive = int((bsp <= 4.0).sum())
+            is_favorite = runner_odds_rank == 1
             
-            # BOX POSITION FEATURES
-            df['box_position_score'] = df['runner_box'].map({
-                1: 1.0, 2: 0.95, 3: 0.9, 4: 0.85, 5: 0.8, 6: 0.75
-            }).fillna(0.7)
-            df['box_inside'] = (df['runner_box'] <= 2).astype(int)
-            df['box_middle'] = ((df['runner_box'] >= 3) & (df['runner_box'] <= 4)).astype(int)
-            df['box_outside'] = (df['runner_box'] >= 5).astype(int)
+            # Build the frame once from the finished columns
+            df = pd.DataFrame({
+                'runner_id': runner_ids,
+                'runner_name': [runner['runner_name'] for runner in runners],
+                'runner_box': box,
+                'bsp': bsp,
+                'market_id': race_data['market_id'],
+                
+                # Race context
+                'venue_abbr': venue[:4].upper(),
+                'race_category': race_grade,
+                'race_grade': race_grade,
+                'distance': distance,
+                'race_hour': race_hour,
+                'is_weekend': is_weekend,
+                
+                'field_size': n,
+                'favorite_bsp': favorite_bsp,
+                'mean_bsp': mean_bsp,
+                'bsp_std': bsp_std,
+                
+                'runner_odds': bsp,
+                'runner_implied_prob': runner_implied_prob,
+                'runner_log_odds': np.log(np.clip(bsp, 1.01, None)),
+                'runner_odds_rank': runner_odds_rank,
+                
+                # ODDS DIFFERENTIALS
+                'odds_vs_favorite_diff': bsp - favorite_bsp,
+                'odds_vs_favorite_ratio': odds_vs_favorite_ratio,
+                'odds_vs_mean_diff': bsp - mean_bsp,
+                'odds_vs_mean_ratio': odds_vs_mean_ratio,
+                'second_favorite_bsp': second_fav_bsp,
+                'odds_vs_second_diff': bsp - second_fav_bsp,
+                'odds_vs_second_ratio': odds_vs_second_ratio,
+                
+                'market_compression': market_compression,
+                'favorite_dominance': favorite_dominance,
+                'odds_std': bsp_std,
+                'odds_range': max_bsp - favorite_bsp,
+                'odds_cv': odds_cv,
+                
+                'num_competitive': num_competitive,
+                'longshot': (bsp > 10.0).astype(int),
+                'weak_favorite': (is_favorite & (bsp > 2.5)).astype(int),
+                'dominant_favorite': (is_favorite & (bsp < 1.8)).astype(int),
+                'competitive_field': int(num_competitive >= 4),
+                
+                # BOX POSITION FEATURES
+                # Unknown (NaN) traps score like traps outside 1-6 and fall in no box group
+                'box_position_score': BOX_POSITION_SCORES[
+                    np.clip(np.nan_to_num(box, nan=0.0), 0, len(BOX_POSITION_SCORES) - 1).astype(np.intp)
+                ],
+                'box_inside': (box <= 2).astype(int),
+                'box_middle': ((box >= 3) & (box <= 4)).astype(int),
+                'box_outside': (box >= 5).astype(int)
+            })
             
             logger.info(f"  Engineered {len(df.columns)} features for {len(df)} runners")
             
             return df
             
         except Exception as e:
-            logger.error(f"Error engineering features: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error engineering features: {str(e)}")
             return None
     
     def predict_race(self, race_data: Dict) -> Dict:
         """
         Predict race outcomes with comprehensive feature engineering.
         """
-        logger.info(f"\n{'='*70}")
-        logger.info(f"GB ENSEMBLE V2: Predicting race")
-        logger.info(f"Venue: {race_data['venue']}")
-        logger.info(f"Distance: {race_data.get('distance', 'Unknown')}m")
-        logger.info(f"Runners: {len(race_data['runners'])}")
+        return self.predict_race_with_features(race_data)[0]
+    
+    def predict_race_with_features(self, race_data: Dict) -> Tuple[Dict, Optional[pd.DataFrame]]:
+        """
+        Predict race outcomes and also return the engineered features.
         
-        results = {
-            'race_info': {
-                'market_id': race_data['market_id'],
-                'venue': race_data['venue'],
-                'race_time': race_data['race_time'],
-                'distance': race_data.get('distance'),
-                'race_grade': race_data.get('race_grade'),
-                'country_code': race_data.get('country_code')
-            },
-            'predictions': [],
-            'betting_opportunities': [],
-            'prediction_time': datetime.now().isoformat()
-        }
+        Args:
+            race_data: Race data including runners, odds, venue, etc.
+            
+        Returns:
+            Tuple of (prediction results, feature DataFrame with base_prob and
+            calibrated_prob columns, or None if features could not be engineered)
+        """
+        return self.predict_races_with_features([race_data])[0]
+    
+    def predict_races_with_features(self, races: List[Dict]) -> List[Tuple[Dict, Optional[pd.DataFrame]]]:
+        """
+        Predict several races with a single call per model.
         
-        # Engineer ALL features for Track Specialist Model
-        logger.info("Step 1: Engineering comprehensive features...")
-        df_runners = self.engineer_track_specialist_features(race_data)
+        CatBoost's fixed cost per predict_proba call outweighs scoring a
+        handful of runners, so the features of every race are stacked and
+        scored together, then the probabilities are split back per race.
+        A race seen before with identical runners and prices is served from
+        the prediction cache.
         
-        if df_runners is None or len(df_runners) == 0:
-            logger.warning("Could not engineer features")
-            return results
+        Args:
+            races: Race data for each race
+            
+        Returns:
+            (prediction results, feature DataFrame) per race, in the same
+            order as races (see predict_race_with_features)
+        """
+        outputs = []
+        to_score = []  # (cache key, results, df_runners) of races with engineered features
         
-        # Get win probabilities from Track Specialist Model
-        logger.info("Step 2: Predicting win probabilities with Track Specialist Model...")
+        for race_data in races:
+            cache_key = self._prediction_cache_key(race_data)
+            with self._prediction_cache_lock:
+                cached = self._prediction_cache.get(cache_key)
+                if cached is not None:
+                    self._prediction_cache.move_to_end(cache_key)
+            if cached is not None:
+                logger.info(f"GB ENSEMBLE V2: Using cached prediction for {race_data['market_id']}")
+                results, df_runners = cached
+                # Callers get their own copies, stamped with this prediction's time
+                results = {
+                    **results,
+                    'predictions': list(results['predictions']),
+                    'prediction_time': datetime.now().isoformat()
+                }
+                outputs.append((results, df_runners.copy()))
+                continue
+            
+            logger.info(f"\n{'='*70}")
+            logger.info(f"GB ENSEMBLE V2: Predicting race")
+            logger.info(f"Venue: {race_data['venue']}")
+            logger.info(f"Distance: {race_data.get('distance', 'Unknown')}m")
+            logger.info(f"Runners: {len(race_data['runners'])}")
+            
+            results = {
+                'race_info': {
+                    'market_id': race_data['market_id'],
+                    'venue': race_data['venue'],
+                    'race_time': race_data['race_time'],
+                    'distance': race_data.get('distance'),
+                    'race_grade': race_data.get('race_grade'),
+                    'country_code': race_data.get('country_code')
+                },
+                'predictions': [],
+                'betting_opportunities': [],
+                'prediction_time': datetime.now().isoformat()
+            }
+            
+            # Engineer ALL features for Track Specialist Model
+            logger.info("Step 1: Engineering comprehensive features...")
+            df_runners = self.engineer_track_specialist_features(race_data)
+            
+            if df_runners is None or len(df_runners) == 0:
+                logger.warning("Could not engineer features")
+                outputs.append((results, None))
+                continue
+            
+            outputs.append((results, df_runners))
+            to_score.append((cache_key, results, df_runners))
         
-        # Use exact feature names expected by model
-        track_model_features = self.track_model.feature_names_
+        if not to_score:
+            return outputs
         
-        # Verify all required features are present
-        missing_features = [f for f in track_model_features if f not in df_runners.columns]
-        if missing_features:
-            logger.error(f"Missing features: {missing_features}")
-            return results
+        # Stack all races so each model is called once
+        features = pd.concat(
+            [df_runners[self.track_features] for _, _, df_runners in to_score], ignore_index=True
+        )
+        features_pool = Pool(features, cat_features=self.track_cat_features)
         
-        # Make predictions with base model
-        base_probs = self.track_model.predict_proba(df_runners[track_model_features])[:, 1]
-        df_runners['base_prob'] = base_probs
+        # Get win probabilities from Track Specialist Model
+        logger.info(f"Step 2: Predicting win probabilities with Track Specialist Model "
+                    f"({len(to_score)} races, {len(features)} runners)...")
+        base_probs = self.track_model.predict_proba(features_pool)[:, 1]
         
         logger.info(f"✓ Base probabilities (range: {base_probs.min():.3f} - {base_probs.max():.3f})")
         
         # Calibrate probabilities
         logger.info("Step 3: Calibrating probabilities...")
-        calibrated_probs = self.calibrator.predict_proba(df_runners[track_model_features])[:, 1]
-        df_runners['calibrated_prob'] = calibrated_probs
+        if self.calibrator_features == self.track_features:
+            # Same inputs as the base model: reuse its Pool
+            calibrator_pool = features_pool
+        else:
+            calibrator_pool = Pool(
+                pd.concat([df_runners[self.calibrator_features] for _, _, df_runners in to_score],
+                          ignore_index=True),
+                cat_features=self.calibrator_cat_features
+            )
+        calibrated_probs = self.calibrator.predict_proba(calibrator_pool)[:, 1]
         
         logger.info(f"✓ Calibrated probabilities (range: {calibrated_probs.min():.3f} - {calibrated_probs.max():.3f})")
         
-        # Package results - just return probabilities for each runner
-        for idx, row in df_runners.iterrows():
-            prediction = {
-                'runner_name': row['runner_name'],
-                'selection_id': row['runner_id'],
-                'trap': row['runner_box'],
-                'ltp': row['runner_odds'],
-                'win_probability': {
-                    'base': float(row['base_prob']),
-                    'calibrated': float(row['calibrated_prob'])
+        # Split probabilities back by race (rows were stacked in race order)
+        start = 0
+        for cache_key, results, df_runners in to_score:
+            end = start + len(df_runners)
+            df_runners['base_prob'] = base_probs[start:end]
+            df_runners['calibrated_prob'] = calibrated_probs[start:end]
+            start = end
+            
+            # Package results - just return probabilities for each runner
+            # (tolist() yields plain Python values, ready for JSON and the DB)
+            for runner_name, selection_id, trap, ltp, base_prob, calibrated_prob in zip(
+                df_runners['runner_name'].tolist(),
+                df_runners['runner_id'].tolist(),
+                df_runners['runner_box'].tolist(),
+                df_runners['runner_odds'].tolist(),
+                df_runners['base_prob'].tolist(),
+                df_runners['calibrated_prob'].tolist()
+            ):
+                prediction = {
+                    'runner_name': runner_name,
+                    'selection_id': selection_id,
+                    'trap': None if np.isnan(trap) else int(trap),
+                    'ltp': ltp,
+                    'win_probability': {
+                        'base': base_prob,
+                        'calibrated': calibrated_prob
+                    }
                 }
-            }
-            results['predictions'].append(prediction)
+                results['predictions'].append(prediction)
+            
+            # Cache private copies: callers may modify what they are returned
+            cache_entry = ({**results, 'predictions': list(results['predictions'])}, df_runners.copy())
+            with self._prediction_cache_lock:
+                self._prediction_cache[cache_key] = cache_entry
+        
+        with self._prediction_cache_lock:
+            while len(self._prediction_cache) > self.PREDICTION_CACHE_SIZE:
+                self._prediction_cache.popitem(last=False)
         
         logger.info(f"{'='*70}\n")
         
-        return results
+        return outputs
 
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ STRATEGY:
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -87,14 +87,55 @@ class GBTrackSpecialistPredictor:
         Returns:
             List of betting opportunities
         """
+        return self.identify_betting_opportunities_with_artifacts(race_data)[0]
+    
+    def identify_betting_opportunities_with_artifacts(
+        self, race_data: Dict
+    ) -> Tuple[List[Dict], Dict, Optional[pd.DataFrame]]:
+        """
+        Identify betting opportunities and return the predictions behind them.
+        
+        Lets callers log predictions without predicting the race again.
+        
+        Args:
+            race_data: Race data including runners, odds, venue, etc.
+            
+        Returns:
+            Tuple of (betting opportunities, prediction results, feature DataFrame)
+        """
+        return self.identify_betting_opportunities_batch([race_data])[0]
+    
+    def identify_betting_opportunities_batch(
+        self, races: List[Dict]
+    ) -> List[Tuple[List[Dict], Dict, Optional[pd.DataFrame]]]:
+        """
+        Identify betting opportunities for several races at once.
+        
+        The races are predicted together by the GB Ensemble (one call per
+        model), then the strategy is applied to each race.
+        
+        Args:
+            races: Race data for each race
+            
+        Returns:
+            (betting opportunities, prediction results, feature DataFrame) per
+            race, in the same order as races
+        """
+        # Get predictions from GB Ensemble
+        predicted = self.predictor.predict_races_with_features(races)
+        
+        return [
+            (self._select_opportunities(race_data, prediction_results), prediction_results, features_df)
+            for race_data, (prediction_results, features_df) in zip(races, predicted)
+        ]
+    
+    def _select_opportunities(self, race_data: Dict, prediction_results: Dict) -> List[Dict]:
+        """Apply the betting strategy to a race's predictions."""
         logger.info(f"\n{'='*70}")
         logger.info(f"GB TRACK SPECIALIST: Analyzing betting opportunities")
         logger.info(f"Venue: {race_data['venue']}")
         logger.info(f"Category: {race_data.get('race_grade', 'Unknown')}")
         
-        # Get predictions from GB Ensemble
-        prediction_results = self.predictor.predict_race(race_data)
-        
         if not prediction_results['predictions']:
             logger.info("No predictions available")
             return []
@@ -113,38 +154,28 @@ class GBTrackSpecialistPredictor:
         probability = top_runner['win_probability']['calibrated']
         category = race_data.get('race_grade', 'Unknown')
         
-        opportunity = None
-        strategy_type = None
+        strategy_subtype = self.classify_strategies([odds], [probability], [category])[0]
         
         # Strategy 1: Mid-Range Odds (5.0-10.0)
         if self.midrange_config['min_odds'] <= odds <= self.midrange_config['max_odds']:
-            strategy_type = 'MIDRANGE'
-            
-            if probability >= self.midrange_config['min_probability']:
-                # Check if in preferred category
-                if category in self.MIDRANGE_PREFERRED_CATEGORIES:
-                    logger.info(f"\n✓ MIDRANGE BET QUALIFIED (Preferred Category)")
-                    logger.info(f"  Category: {category} (in {self.MIDRANGE_PREFERRED_CATEGORIES})")
-                    logger.info(f"  Probability: {probability:.1%} >= {self.midrange_config['min_probability']:.1%}")
-                    opportunity = self._create_opportunity(top_runner, race_data, 'MIDRANGE_PREFERRED')
-                else:
-                    # Still bet at 35%+ threshold even if not preferred category
-                    logger.info(f"\n✓ MIDRANGE BET QUALIFIED (Non-preferred Category)")
-                    logger.info(f"  Category: {category} (not in preferred list)")
-                    logger.info(f"  Probability: {probability:.1%} >= {self.midrange_config['min_probability']:.1%}")
-                    opportunity = self._create_opportunity(top_runner, race_data, 'MIDRANGE_STANDARD')
+            if strategy_subtype == 'MIDRANGE_PREFERRED':
+                logger.info(f"\n✓ MIDRANGE BET QUALIFIED (Preferred Category)")
+                logger.info(f"  Category: {category} (in {self.MIDRANGE_PREFERRED_CATEGORIES})")
+                logger.info(f"  Probability: {probability:.1%} >= {self.midrange_config['min_probability']:.1%}")
+            elif strategy_subtype == 'MIDRANGE_STANDARD':
+                # Still bet at 35%+ threshold even if not preferred category
+                logger.info(f"\n✓ MIDRANGE BET QUALIFIED (Non-preferred Category)")
+                logger.info(f"  Category: {category} (not in preferred list)")
+                logger.info(f"  Probability: {probability:.1%} >= {self.midrange_config['min_probability']:.1%}")
             else:
                 logger.info(f"\n✗ MIDRANGE: Probability too low ({probability:.1%} < {self.midrange_config['min_probability']:.1%})")
         
         # Strategy 2: Longshots (10.0-20.0)
         elif self.longshot_config['min_odds'] <= odds <= self.longshot_config['max_odds']:
-            strategy_type = 'LONGSHOT'
-            
-            if probability >= self.longshot_config['min_probability']:
-                confidence = 'HIGH' if probability >= self.longshot_config['safer_probability'] else 'MEDIUM'
+            if strategy_subtype:
+                confidence = strategy_subtype.split('_')[1]
                 logger.info(f"\n✓ LONGSHOT BET QUALIFIED ({confidence} confidence)")
                 logger.info(f"  Probability: {probability:.1%} >= {self.longshot_config['min_probability']:.1%}")
-                opportunity = self._create_opportunity(top_runner, race_data, f'LONGSHOT_{confidence}')
             else:
                 logger.info(f"\n✗ LONGSHOT: Probability too low ({probability:.1%} < {self.longshot_config['min_probability']:.1%})")
         
@@ -155,10 +186,45 @@ class GBTrackSpecialistPredictor:
             else:
                 logger.info(f"\n✗ Odds too high ({odds:.2f} > {self.longshot_config['max_odds']:.2f})")
         
+        opportunity = self._create_opportunity(top_runner, race_data, strategy_subtype) if strategy_subtype else None
+        
         logger.info(f"{'='*70}\n")
         
         return [opportunity] if opportunity else []
     
+    def classify_strategies(self, odds, probability, category) -> np.ndarray:
+        """
+        Classify top runners into strategy subtypes in one vectorized pass.
+        
+        Mid-range odds take precedence where the two odds bands meet (10.0).
+        
+        Args:
+            odds: Top runner odds, one per race
+            probability: Calibrated win probabilities, one per race
+            category: Race grades, one per race
+            
+        Returns:
+            Object array of strategy subtypes ('MIDRANGE_PREFERRED',
+            'MIDRANGE_STANDARD', 'LONGSHOT_HIGH', 'LONGSHOT_MEDIUM'),
+            None where no strategy applies
+        """
+        odds = np.asarray(odds, dtype=float)
+        probability = np.asarray(probability, dtype=float)
+        
+        midrange = (odds >= self.midrange_config['min_odds']) & (odds <= self.midrange_config['max_odds'])
+        longshot = ~midrange & (odds >= self.longshot_config['min_odds']) & (odds <= self.longshot_config['max_odds'])
+        midrange_qualified = midrange & (probability >= self.midrange_config['min_probability'])
+        longshot_qualified = longshot & (probability >= self.longshot_config['min_probability'])
+        safer = probability >= self.longshot_config['safer_probability']
+        preferred = np.isin(np.asarray(category, dtype=object), self.MIDRANGE_PREFERRED_CATEGORIES)
+        
+        return np.select(
+            [midrange_qualified & preferred, midrange_qualified,
+             longshot_qualified & safer, longshot_qualified],
+            ['MIDRANGE_PREFERRED', 'MIDRANGE_STANDARD', 'LONGSHOT_HIGH', 'LONGSHOT_MEDIUM'],
+            default=None
+        )
+    
     def _create_opportunity(self, runner: Dict, race_data: Dict, strategy_subtype: str) -> Dict:
         """Create betting opportunity data structure."""
         odds = runner['ltp']
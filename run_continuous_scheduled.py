@@ -20,7 +20,10 @@ from pathlib import Path
 import signal
 import sys
 import threading
-from typing import Dict, Set
+import heapq
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
 
 from gb_betting_system import GBBettingSystem
 
@@ -30,10 +33,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Section separator for log output
+_BANNER = '=' * 70
+
 
 class ScheduledGBBettingRunner:
     """Runs GB Track Specialist system with scheduled race processing."""
     
+    # Scheduled races processed at once (keeps a slow race from delaying the next)
+    RACE_WORKERS = 4
+    
+    # Races due within this many seconds of each other are fetched and predicted together
+    BATCH_WINDOW_SECONDS = 2
+    
+    # Scans start up to this fraction of an interval early, so runner instances
+    # started together drift apart instead of polling Betfair in lockstep
+    # (early only: a late scan could miss races between scan windows)
+    SCAN_JITTER_FRACTION = 0.1
+    
+    # Each race listing covers this many scan windows, so the next scan can reuse it
+    UPCOMING_RACES_LOOKAHEAD_SCANS = 2
+    
     def __init__(self, 
                  scan_interval_minutes: int = 15,
                  target_minutes_before_race: int = 1,
@@ -48,17 +68,28 @@ class ScheduledGBBettingRunner:
         """
         self.scan_interval_minutes = scan_interval_minutes
         self.target_minutes_before_race = target_minutes_before_race
+        self._scan_interval_s = scan_interval_minutes * 60
+        self._scan_interval = timedelta(minutes=scan_interval_minutes)
+        self._target_delta = timedelta(minutes=target_minutes_before_race)
         self.dry_run = dry_run
         self.running = True
+        self._shutdown_event = threading.Event()  # Set on shutdown to cut the between-scan wait short
         self.system = None
         
         # Track scheduled races to prevent duplicates
         self.scheduled_races: Set[str] = set()  # market_ids that are scheduled
-        self.scheduled_races_lock = threading.Lock()
         
-        # Track active timers for cleanup
-        self.active_timers: Dict[str, threading.Timer] = {}
-        self.timers_lock = threading.Lock()
+        # One scheduler thread pops races from a heap when they are due
+        self._schedule_heap: List[Tuple[float, str, Dict]] = []  # (monotonic deadline, market_id, race), earliest first
+        self._schedule_cv = threading.Condition()  # Guards scheduled_races and _schedule_heap together
+        self._scheduler_thread = None
+        self._jitter = random.SystemRandom()  # OS-seeded, so processes started together diverge
+        self._race_executor = ThreadPoolExecutor(max_workers=self.RACE_WORKERS, thread_name_prefix='gb-race')
+        self._log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gb-logs')  # Per-scan log saves, in order
+        
+        # Last race listing and the UTC time it covers up to
+        self._upcoming_races: List[Dict] = []
+        self._upcoming_races_until = None
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -68,27 +99,23 @@ class ScheduledGBBettingRunner:
         """Handle shutdown signals gracefully."""
         logger.info(f"\n[GB TRACK SPECIALIST] Received signal {signum}. Shutting down gracefully...")
         self.running = False
+        self._shutdown_event.set()
         
-    def _schedule_race(self, race: Dict):
+    def _schedule_race(self, race: Dict, now: datetime):
         """
         Schedule a race to be processed at T-1 minute before start.
         
+        The caller has already added the race to scheduled_races.
+        
         Args:
-            race: Race dictionary with market_id, venue, race_time
+            race: Race dictionary with market_id, venue, race_time, race_time_dt
+            now: Current UTC time
         """
         market_id = race['market_id']
         
-        # Check if already scheduled
-        with self.scheduled_races_lock:
-            if market_id in self.scheduled_races:
-                logger.debug(f"[GB] Race {race['venue']} already scheduled, skipping")
-                return
-            self.scheduled_races.add(market_id)
-        
         # Calculate when to process (T-1 minute by default)
-        race_time = datetime.fromisoformat(race['race_time'].replace('Z', '+00:00'))
-        process_time = race_time - timedelta(minutes=self.target_minutes_before_race)
-        now = datetime.now(timezone.utc)
+        race_time = race['race_time_dt']
+        process_time = race_time - self._target_delta
         
         # Calculate delay in seconds
         delay_seconds = (process_time - now).total_seconds()
@@ -96,26 +123,54 @@ class ScheduledGBBettingRunner:
         if delay_seconds < 0:
             # Race is too close, process immediately
             logger.warning(f"[GB] Race {race['venue']} at {race_time.strftime('%H:%M:%S')} is already within {self.target_minutes_before_race} mins, processing now")
-            self._process_scheduled_race(market_id, race)
-        elif delay_seconds > (self.scan_interval_minutes * 60):
+            self._race_executor.submit(self._process_scheduled_race, market_id, race)
+        elif delay_seconds > self._scan_interval_s:
             # Race is too far ahead, will be picked up in next scan
-            logger.debug(f"[GB] Race {race['venue']} at {race_time.strftime('%H:%M:%S')} is {delay_seconds/60:.1f} mins away, will reschedule")
-            with self.scheduled_races_lock:
+            logger.debug("[GB] Race %s at %s is %.1f mins away, will reschedule",
+                         race['venue'], race_time.strftime('%H:%M:%S'), delay_seconds / 60)
+            with self._schedule_cv:
                 self.scheduled_races.discard(market_id)
         else:
             # Schedule for processing at target time before race
-            logger.info(f"[GB] 📅 SCHEDULED: {race['venue']} at {race_time.strftime('%H:%M:%S')} → Processing in {delay_seconds/60:.1f} mins ({process_time.strftime('%H:%M:%S')})")
-            
-            timer = threading.Timer(
-                delay_seconds,
-                self._process_scheduled_race,
-                args=(market_id, race)
-            )
+            logger.info("[GB] 📅 SCHEDULED: %s at %s → Processing in %.1f mins (%s)",
+                        race['venue'], race_time.strftime('%H:%M:%S'), delay_seconds / 60, process_time.strftime('%H:%M:%S'))
             
-            with self.timers_lock:
-                self.active_timers[market_id] = timer
+            # Wall-clock delay is converted once; NTP or clock changes cannot move the deadline
+            deadline = time.monotonic() + delay_seconds
+            with self._schedule_cv:
+                heapq.heappush(self._schedule_heap, (deadline, market_id, race))
+                self._schedule_cv.notify()
+    
+    def _scheduler_loop(self):
+        """
+        Background thread that hands races to the worker pool when they are due.
+        
+        Races due within BATCH_WINDOW_SECONDS of the first are handed over
+        together, slightly early, so they share one market-data fetch.
+        """
+        while True:
+            with self._schedule_cv:
+                while self.running:
+                    now = time.monotonic()
+                    if self._schedule_heap and self._schedule_heap[0][0] <= now:
+                        break
+                    
+                    timeout = self._schedule_heap[0][0] - now if self._schedule_heap else None
+                    self._schedule_cv.wait(timeout)
+                
+                if not self.running:
+                    return
+                
+                batch_until = now + self.BATCH_WINDOW_SECONDS
+                due = []
+                while self._schedule_heap and self._schedule_heap[0][0] <= batch_until:
+                    _, market_id, race = heapq.heappop(self._schedule_heap)
+                    due.append((market_id, race))
             
-            timer.start()
+            if len(due) == 1:
+                self._race_executor.submit(self._process_scheduled_race, *due[0])
+            else:
+                self._race_executor.submit(self._process_scheduled_races, due)
     
     def _process_scheduled_race(self, market_id: str, race_info: Dict):
         """
@@ -126,9 +181,9 @@ class ScheduledGBBettingRunner:
             race_info: Race information dict
         """
         try:
-            logger.info(f"\n{'='*70}")
+            logger.info(f"\n{_BANNER}")
             logger.info(f"[GB TRACK SPECIALIST] ⏰ PROCESSING SCHEDULED RACE")
-            logger.info(f"{'='*70}")
+            logger.info(_BANNER)
             logger.info(f"Venue: {race_info['venue']}")
             logger.info(f"Race time: {race_info['race_time']}")
             logger.info(f"Market ID: {market_id}")
@@ -136,83 +191,139 @@ class ScheduledGBBettingRunner:
             # Process the race
             result = self.system.process_race(market_id)
             
-            logger.info(f"{'='*70}\n")
+            logger.info(f"{_BANNER}\n")
             
         except Exception as e:
-            logger.error(f"[GB] Error processing scheduled race {market_id}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[GB] Error processing scheduled race {market_id}: {str(e)}")
         finally:
             # Clean up tracking
-            with self.scheduled_races_lock:
+            with self._schedule_cv:
                 self.scheduled_races.discard(market_id)
-            with self.timers_lock:
-                self.active_timers.pop(market_id, None)
+    
+    def _process_scheduled_races(self, races: List[Tuple[str, Dict]]):
+        """
+        Process several races that are due together with one market-data fetch.
+        
+        Args:
+            races: (market_id, race information dict) per race
+        """
+        market_ids = [market_id for market_id, _ in races]
+        try:
+            logger.info(f"\n{_BANNER}")
+            logger.info(f"[GB TRACK SPECIALIST] ⏰ PROCESSING {len(races)} SCHEDULED RACES")
+            logger.info(_BANNER)
+            for market_id, race_info in races:
+                logger.info(f"  {race_info['venue']} at {race_info['race_time']} (Market ID: {market_id})")
+            
+            # Fetch all markets together, then predict and process them as a batch
+            race_data_list = self.system.get_race_data_batch(market_ids)
+            results = self.system.process_races(market_ids, race_data_list)
+            
+            logger.info(f"{_BANNER}\n")
+            
+        except Exception as e:
+            logger.exception(f"[GB] Error processing scheduled races {market_ids}: {str(e)}")
+        finally:
+            # Clean up tracking
+            with self._schedule_cv:
+                self.scheduled_races.difference_update(market_ids)
+    
+    def _get_upcoming_races(self) -> List[Dict]:
+        """
+        Get GB races starting within the next scan window.
+        
+        Fetches several scan windows ahead (plus a minute of margin) and
+        serves later scans from that listing while it still covers their
+        window, so only every other scan calls Betfair by default.
+        
+        Returns:
+            Race dictionaries with market_id, venue, race_time and the
+            parsed race_time_dt (UTC)
+        """
+        now = datetime.now(timezone.utc)
+        window_end = now + self._scan_interval
+        
+        if self._upcoming_races_until is None or window_end > self._upcoming_races_until:
+            lookahead = self._scan_interval * self.UPCOMING_RACES_LOOKAHEAD_SCANS + timedelta(minutes=1)
+            self._upcoming_races = self.system.betfair_client.get_upcoming_greyhound_races(
+                hours_ahead=lookahead.total_seconds() / 3600.0,
+                country_codes=['GB']
+            )
+            self._upcoming_races_until = now + lookahead
+            
+            # Parse start times once per listing; scans and scheduling reuse them
+            for race in self._upcoming_races:
+                race['race_time_dt'] = datetime.fromisoformat(race['race_time'].replace('Z', '+00:00'))
+        else:
+            logger.info(f"[GB] Using race listing fetched for up to {self._upcoming_races_until.strftime('%H:%M:%S')}")
+        
+        return [
+            race for race in self._upcoming_races
+            if now <= race['race_time_dt'] <= window_end
+        ]
     
     def _scan_and_schedule_races(self):
         """Scan for upcoming races and schedule them for processing."""
         try:
-            logger.info(f"\n{'='*70}")
+            logger.info(f"\n{_BANNER}")
             logger.info(f"[GB TRACK SPECIALIST] SCANNING FOR RACES TO SCHEDULE")
-            logger.info(f"{'='*70}")
+            logger.info(_BANNER)
             logger.info(f"Looking ahead: {self.scan_interval_minutes} minutes")
             logger.info(f"Target processing: T-{self.target_minutes_before_race} minutes before race")
             
             # Get GB races in the next scan_interval minutes
-            races = self.system.betfair_client.get_upcoming_greyhound_races(
-                hours_ahead=self.scan_interval_minutes / 60.0,
-                country_codes=['GB']
-            )
+            races = self._get_upcoming_races()
             
             if not races:
                 logger.info("[GB] No upcoming GB races found in scan window")
                 return
             
-            logger.info(f"[GB] Found {len(races)} GB races in next {self.scan_interval_minutes} minutes\n")
+            logger.info("[GB] Found %d GB races in next %d minutes\n", len(races), self.scan_interval_minutes)
             
             # Schedule each race
             scheduled_count = 0
-            already_scheduled_count = 0
             
-            for race in races:
-                race_time = datetime.fromisoformat(race['race_time'].replace('Z', '+00:00'))
-                now = datetime.now(timezone.utc)
-                minutes_until = (race_time - now).total_seconds() / 60
-                
-                with self.scheduled_races_lock:
-                    if race['market_id'] in self.scheduled_races:
-                        already_scheduled_count += 1
-                        continue
-                
-                self._schedule_race(race)
+            # Only this thread adds to scheduled_races, so one snapshot serves the whole scan
+            with self._schedule_cv:
+                already_scheduled = set(self.scheduled_races)
+            
+            now = datetime.now(timezone.utc)
+            incoming = {race['market_id']: race for race in races}
+            new_ids = incoming.keys() - already_scheduled
+            already_scheduled_count = len(incoming) - len(new_ids)
+            new_races = sorted((incoming[market_id] for market_id in new_ids), key=lambda race: race['race_time_dt'])
+            
+            with self._schedule_cv:
+                self.scheduled_races.update(race['market_id'] for race in new_races)
+            
+            for race in new_races:
+                self._schedule_race(race, now)
                 scheduled_count += 1
             
-            logger.info(f"\n{'='*70}")
+            logger.info(f"\n{_BANNER}")
             logger.info(f"[GB TRACK SPECIALIST] SCAN SUMMARY")
-            logger.info(f"{'='*70}")
+            logger.info(_BANNER)
             logger.info(f"  GB races found: {len(races)}")
             logger.info(f"  Newly scheduled: {scheduled_count}")
             logger.info(f"  Already scheduled: {already_scheduled_count}")
             logger.info(f"  Total scheduled races: {len(self.scheduled_races)}")
-            logger.info(f"  Active timers: {len(self.active_timers)}")
+            logger.info(f"  Waiting to process: {len(self._schedule_heap)}")
             
         except Exception as e:
-            logger.error(f"[GB] Error during race scan: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[GB] Error during race scan: {str(e)}")
     
     def run(self):
         """Run the GB Track Specialist scheduled betting system continuously."""
-        logger.info("="*70)
+        logger.info(_BANNER)
         logger.info("[GB TRACK SPECIALIST] STARTING SCHEDULED BETTING SYSTEM")
-        logger.info("="*70)
+        logger.info(_BANNER)
         logger.info(f"Strategy: Mid-Range (5-10 odds) & Longshots (10-20 odds)")
         logger.info(f"Mode: {'LIVE' if not self.dry_run else 'DRY RUN'}")
         logger.info(f"Scan interval: {self.scan_interval_minutes} minutes")
         logger.info(f"Target processing: T-{self.target_minutes_before_race} minutes")
         logger.info(f"Country: GB only")
         logger.info(f"Press Ctrl+C to stop gracefully")
-        logger.info("="*70 + "\n")
+        logger.info(_BANNER + "\n")
         
         scan_count = 0
         
@@ -222,85 +333,97 @@ class ScheduledGBBettingRunner:
             self.system = GBBettingSystem(dry_run=self.dry_run)
             logger.info("[GB] ✓ System initialized\n")
             
+            self._scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
+            self._scheduler_thread.start()
+            
             while self.running:
                 scan_count += 1
                 scan_start = datetime.now()
+                scan_start_mono = time.monotonic()
                 
-                logger.info(f"\n{'='*70}")
+                logger.info(f"\n{_BANNER}")
                 logger.info(f"[GB TRACK SPECIALIST] SCAN #{scan_count} - {scan_start.strftime('%Y-%m-%d %H:%M:%S')}")
-                logger.info(f"{'='*70}")
+                logger.info(_BANNER)
                 
                 # Scan and schedule races
                 self._scan_and_schedule_races()
                 
-                # Save logs every scan
+                # Save logs every scan: snapshot here, write off the scan loop
                 try:
-                    self.system.save_logs()
-                    logger.info(f"\n[GB] ✓ Logs saved")
-                    
-                    # Summary stats
-                    if self.system.bets_placed_log:
-                        total_stake = sum(b.get('stake', 0) for b in self.system.bets_placed_log)
-                        wins = sum(1 for b in self.system.bets_placed_log if b.get('won'))
-                        losses = sum(1 for b in self.system.bets_placed_log if b.get('won') == False)
-                        pending = len(self.system.bets_placed_log) - wins - losses
-                        
-                        logger.info(f"  Total races logged: {len(self.system.all_races_log)}")
-                        logger.info(f"  Total bets placed: {len(self.system.bets_placed_log)}")
-                        logger.info(f"  Bets won: {wins} | Lost: {losses} | Pending: {pending}")
-                        logger.info(f"  Total staked: ${total_stake:.2f}")
-                        
-                        # Calculate P&L for completed bets
-                        if wins > 0 or losses > 0:
-                            completed_bets = [b for b in self.system.bets_placed_log if 'won' in b]
-                            if completed_bets:
-                                total_profit = sum(b.get('profit', 0) for b in completed_bets)
-                                logger.info(f"  Profit/Loss: ${total_profit:+.2f}")
-                    
+                    self._log_executor.submit(
+                        self._save_logs_and_summarize, self.system.snapshot_logs(), self.system.get_bet_summary()
+                    )
                 except Exception as e:
                     logger.error(f"[GB] Error saving logs: {str(e)}")
                 
                 # Calculate next scan time
                 if self.running:
-                    next_scan = scan_start.timestamp() + (self.scan_interval_minutes * 60)
-                    now = datetime.now().timestamp()
-                    sleep_time = max(0, next_scan - now)
+                    next_scan = scan_start_mono + self._scan_interval_s
+                    next_scan -= self._jitter.uniform(0, self.SCAN_JITTER_FRACTION) * self._scan_interval_s
+                    sleep_time = max(0, next_scan - time.monotonic())
                     
-                    next_scan_time = datetime.fromtimestamp(next_scan).strftime('%H:%M:%S')
-                    logger.info(f"\n{'='*70}")
+                    next_scan_time = (datetime.now() + timedelta(seconds=sleep_time)).strftime('%H:%M:%S')
+                    logger.info(f"\n{_BANNER}")
                     logger.info(f"[GB] Next scan in {sleep_time/60:.1f} minutes at {next_scan_time}")
-                    logger.info(f"Scheduled races: {len(self.scheduled_races)} | Active timers: {len(self.active_timers)}")
-                    logger.info(f"{'='*70}\n")
+                    logger.info(f"Scheduled races: {len(self.scheduled_races)} | Waiting to process: {len(self._schedule_heap)}")
+                    logger.info(f"{_BANNER}\n")
                     
-                    # Sleep in small intervals to check for shutdown signal
-                    sleep_intervals = int(sleep_time / 10) + 1
-                    for i in range(sleep_intervals):
-                        if not self.running:
-                            break
-                        time.sleep(min(10, sleep_time))
-                        sleep_time -= 10
+                    # Sleep until the next scan, waking at once on a shutdown signal
+                    self._shutdown_event.wait(timeout=sleep_time)
                         
         except KeyboardInterrupt:
             logger.info("\n\n[GB] Received keyboard interrupt")
         except Exception as e:
-            logger.error(f"[GB] Fatal error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[GB] Fatal error: {str(e)}")
         finally:
             self._shutdown()
     
+    def _save_logs_and_summarize(self, snapshot: Dict, stats: Dict):
+        """
+        Write a log snapshot and log the bet summary (runs on the log executor).
+        
+        Only the snapshot is touched here, never the system's live logs.
+        
+        Args:
+            snapshot: Logs from GBBettingSystem.snapshot_logs at scan time
+            stats: Bet totals from GBBettingSystem.get_bet_summary at scan time
+        """
+        try:
+            self.system.write_logs(snapshot)
+            logger.info(f"\n[GB] ✓ Logs saved")
+            
+            # Summary stats (running totals kept by the system)
+            if stats['bets']:
+                logger.info(f"  Total races logged: {stats['races']}")
+                logger.info(f"  Total bets placed: {stats['bets']}")
+                logger.info(f"  Bets won: {stats['won']} | Lost: {stats['lost']} | Pending: {stats['pending']}")
+                logger.info(f"  Total staked: ${stats['stake']:.2f}")
+                
+                # P&L for completed bets
+                if stats['won'] > 0 or stats['lost'] > 0:
+                    logger.info(f"  Profit/Loss: ${stats['profit']:+.2f}")
+            
+        except Exception as e:
+            logger.error(f"[GB] Error saving logs: {str(e)}")
+    
     def _shutdown(self):
         """Perform graceful shutdown."""
-        logger.info("\n" + "="*70)
+        logger.info("\n" + _BANNER)
         logger.info("[GB TRACK SPECIALIST] SHUTTING DOWN")
-        logger.info("="*70)
+        logger.info(_BANNER)
+        
+        # Stop the scheduler and drop races that are not due yet
+        with self._schedule_cv:
+            self.running = False
+            cancelled, self._schedule_heap = self._schedule_heap, []
+            self._schedule_cv.notify()
+        logger.info(f"[GB] Cancelled {len(cancelled)} scheduled races")
+        if self._scheduler_thread:
+            self._scheduler_thread.join(timeout=5)
         
-        # Cancel all active timers
-        logger.info(f"[GB] Cancelling {len(self.active_timers)} active timers...")
-        with self.timers_lock:
-            for market_id, timer in self.active_timers.items():
-                timer.cancel()
-            self.active_timers.clear()
+        # Let races already being processed and queued log saves finish before the final save
+        self._race_executor.shutdown(wait=True)
+        self._log_executor.shutdown(wait=True)
         
         if self.system:
             try:
@@ -316,7 +439,7 @@ class ScheduledGBBettingRunner:
             except Exception as e:
                 logger.error(f"[GB] Error during shutdown: {str(e)}")
         
-        logger.info("="*70 + "\n")
+        logger.info(_BANNER + "\n")
 
 
 if __name__ == "__main__":